@@ -19,6 +19,7 @@
 
 import discord
 from discord.ext import commands
+import logging
 import os
 import sys
 from dotenv import load_dotenv
@@ -27,19 +28,9 @@ from utils.config import load_config
 from ui.views.TicketPanelView import TicketPanelView
 from ui.views.TicketModView import TicketModView, TransferView
 from ui.views.ReviewPanelView import ReviewPanelView
+from utils import tickets, ratelimit, transcripts
 
-if sys.version_info < (3, 10):
-    sys.exit("Python 3.10 or higher is required to run RaelBot.")
-
-botlogger = setup_logger()
-
-load_dotenv()
-token = os.getenv("bot_token")
-
-if not token:
-    botlogger.critical("Token is not found or is invalid.")
-    raise RuntimeError("Invalid Token")
-
+botlogger = logging.getLogger("bot")
 botconfig = load_config()
 
 
@@ -58,15 +49,20 @@ class RaelBot(commands.Bot):
 
     async def setup_hook(self):
         botlogger.info("Starting setup_hook.")
+        ratelimit.install(self.http)
         extensions = [
             "cogs.admin",
             "cogs.general_commands",
             "cogs.embeds.embed_builder",
             "cogs.tickets.tickets",
             "cogs.tickets.inactivity",
+            "cogs.tickets.transcripts",
             "cogs.welcome",
             "cogs.errors",
         ]
+        await tickets.load_tickets()
+        botlogger.info("Loaded the tickets store.")
+
         self.add_view(TicketPanelView())
         botlogger.info("Added the ticket panel view.")
 
@@ -93,9 +89,36 @@ class RaelBot(commands.Bot):
         botlogger.info("Syncing App Commands.")
         await self.tree.sync(guild=guild)
 
+    async def close(self):
+        # Disconnect first, so no event can queue a write once the
+        # stores have shut down their I/O threads.
+        await super().close()
+        await tickets.close()
+        botlogger.info("Flushed and closed the tickets store.")
+        await transcripts.close()
+
     async def on_ready(self):
         botlogger.info(f"Logged in as {self.user} ID : ({self.user.id})")
 
 
-bot = RaelBot()
-bot.run(token)
+def main():
+    if sys.version_info < (3, 10):
+        sys.exit("Python 3.10 or higher is required to run RaelBot.")
+
+    setup_logger()
+
+    load_dotenv()
+    token = os.getenv("bot_token")
+
+    if not token:
+        botlogger.critical("Token is not found or is invalid.")
+        raise RuntimeError("Invalid Token")
+
+    bot = RaelBot()
+    bot.run(token)
+
+
+# Transcript render workers are spawned and import this module again, so
+# everything with a side effect runs from main() in the main process only.
+if __name__ == "__main__":
+    main()
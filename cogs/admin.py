@@ -10,8 +10,10 @@
 from discord.ext import commands
 import logging
 import discord
+import time
 from utils import embeds
 from utils import tickets
+from utils import transcripts
 from utils.config import load_config
 from utils.permissions import is_admin
 from ui.views.TicketPanelView import TicketPanelView
@@ -174,7 +176,7 @@ class AdminOnly(commands.Cog):
     async def tickets_count(self, ctx: commands.Context):
         counts_embed = embeds.create_embed(
             title="***Total tickets created in this server!***",
-            description=f"`You have {await tickets.get_tickets_count()} tickets!`\n`Reminder: This command shows the count of all tickets ever created in your server\nThis can be wrong if some tickets data got corrupted.`"        
+            description=f"`You have {await tickets.get_total_tickets_count()} tickets!`\n`Reminder: This command shows the count of all tickets ever created in your server\nThis can be wrong if some tickets data got corrupted.`"        
         )
         await ctx.send(embed=counts_embed)
 
@@ -199,5 +201,95 @@ class AdminOnly(commands.Cog):
         if isinstance(error, commands.CheckFailure):
             await handle_admin_checkfailure(ctx)
 
+    @commands.hybrid_command(
+        name="search_transcripts", description="Search the archived transcripts of closed tickets."
+    )
+    @commands.guild_only()
+    @is_admin()
+    async def search_transcripts(
+        self,
+        ctx: commands.Context,
+        query: str,
+        owner: discord.Member = None,
+        claimer: discord.Member = None,
+        days: int = None,
+    ):
+        started = time.perf_counter()
+        # Embed titles are capped at 256 characters.
+        shown_query = query if len(query) <= 100 else f"{query[:99]}…"
+        matches = await transcripts.search_archive(
+            query,
+            owner_id=owner.id if owner else None,
+            claimer_id=claimer.id if claimer else None,
+            closed_after=time.time() - days * 86400 if days else None,
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        if not matches:
+            await ctx.send(
+                embed=embeds.create_embed(
+                    title="***No matching transcripts***",
+                    description=f"`Nothing in the archive matches {shown_query}.`",
+                ),
+                ephemeral=True
+            )
+            return
+        fields = []
+        for score, entry in matches:
+            details = [f"`{entry['channel_id']}`"]
+            if entry.get("owner_id"):
+                details.append(f"Owner <@{entry['owner_id']}>")
+            if entry.get("claimer_id"):
+                details.append(f"Claimer <@{entry['claimer_id']}>")
+            if entry.get("closed_at"):
+                details.append(f"Closed <t:{int(entry['closed_at'])}:d>")
+            details.append(f"{entry['messages']} messages, score {score:.2f}")
+            fields.append((f"#{entry['name']}", " • ".join(details), False))
+        await ctx.send(
+            embed=embeds.create_embed(
+                title=f"***Transcripts matching {shown_query}***",
+                description="`Use /archived_transcript with a ticket id to get its transcript.`",
+                fields=fields,
+                footer=f"{len(matches)} results in {elapsed:.1f} ms",
+            ),
+            ephemeral=True
+        )
+
+    @search_transcripts.error
+    async def search_transcripts_error(self, ctx: commands.Context, error):
+        if isinstance(error, commands.CheckFailure):
+            await handle_admin_checkfailure(ctx)
+
+    @commands.hybrid_command(
+        name="archived_transcript", description="Get the transcript of an archived ticket."
+    )
+    @commands.guild_only()
+    @is_admin()
+    async def archived_transcript(self, ctx: commands.Context, ticket_id: str):
+        if not ticket_id.isdigit():
+            await ctx.send(embed=embeds.BAD_ARG, ephemeral=True)
+            return
+        await ctx.defer(ephemeral=True)
+        async with transcripts.render_archived(int(ticket_id)) as transcript:
+            if not transcript:
+                await ctx.send(
+                    embed=embeds.create_embed(
+                        title="***Transcript not found***",
+                        description="`There is no archived transcript for this ticket.`",
+                        color=self.bot_config.default_embed_error_color
+                    ),
+                    ephemeral=True
+                )
+                return
+            for part in transcript.parts:
+                await ctx.send(
+                    file=discord.File(part, filename=part.name),
+                    ephemeral=True
+                )
+
+    @archived_transcript.error
+    async def archived_transcript_error(self, ctx: commands.Context, error):
+        if isinstance(error, commands.CheckFailure):
+            await handle_admin_checkfailure(ctx)
+
 async def setup(bot: commands.Bot):
     await bot.add_cog(AdminOnly(bot))
@@ -7,100 +7,147 @@
 # If not, see https://www.gnu.org/licenses/gpl-3.0.txt
 
 
-from discord.ext import tasks, commands
+from discord.ext import commands, tasks
 import discord
-from utils import tickets
-import datetime
+from utils import tickets, ticket_events, ratelimit
 from utils.config import load_config
+from utils.scheduler import DeadlineScheduler
+from utils.timestmp import utcnow
+import asyncio
 import logging
+import time
 
 botlogger = logging.getLogger("bot")
 botconfig = load_config()
 
 
 class InactivityCog(commands.Cog):
+    """
+    Moves open tickets to the inactive category once nobody wrote in them
+    for inactive_after minutes. Every open ticket has a deadline in the
+    scheduler, messages push it forward and the bot only wakes up when
+    one of them is due. A sweep every inactivity_loop_interval minutes
+    sets the deadlines up and catches any that were missed.
+    """
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.inactive.start()
+        self.inactive_after = botconfig.inactive_after * 60  # In seconds
+        self.inactive_category = None
+        self.deadlines = DeadlineScheduler(self.check)
+        # Bounds the tickets handled at once by a sweep or by deadlines
+        # coming due together, such as after downtime.
+        self.limit = asyncio.Semaphore(botconfig.inactivity_concurrency)
+        self.sweep.start()
 
     def cog_unload(self):
-        self.inactive.cancel()
-
-    @tasks.loop(minutes=botconfig.inactivity_loop_interval)
-    async def inactive(self) -> None:
-        botlogger.info("Starting inactivity loop...")
-        all_tickets: dict = await tickets.get_all_tickets()
-        for ticket in all_tickets.items():
-            tckt_chnl_id = ticket[0]
-            try:
-                tckt_chnl: discord.TextChannel = await self.bot.fetch_channel(
-                    tckt_chnl_id
+        self.sweep.cancel()
+        self.deadlines.stop()
+        ticket_events.unsubscribe(ticket_events.TicketEvent, self.on_ticket_event)
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if not message.guild:
+            return
+        sent_at = message.created_at.timestamp()
+        if await tickets.touch_ticket(message.channel.id, sent_at):
+            if message.channel.id in self.deadlines.deadlines:
+                self.deadlines.schedule(
+                    message.channel.id, sent_at + self.inactive_after
                 )
-            except (discord.NotFound, discord.HTTPException):
-                tckt_chnl: discord.TextChannel = self.bot.get_channel(
-                    tckt_chnl_id
-                )
-
-            if not tckt_chnl:
-                continue
 
-            tickets_dict, crnt_tckt = await tickets.get_tickets_and_ticket(
-                tckt_chnl_id
+    async def on_ticket_event(self, event: ticket_events.TicketEvent):
+        if isinstance(event, ticket_events.TicketCreated):
+            self.deadlines.schedule(
+                event.channel_id, event.ticket.active_at + self.inactive_after
             )
+        elif isinstance(event, ticket_events.TicketStatusChanged):
+            if event.ticket.status == tickets.TicketStatus.OPEN:
+                # Reopening counts as activity, or it would go straight back.
+                self.deadlines.schedule(
+                    event.channel_id,
+                    utcnow().timestamp() + self.inactive_after,
+                )
+            else:
+                self.deadlines.cancel(event.channel_id)
+
+    @ratelimit.background
+    async def check(self, tckt_chnl_id: int) -> bool:
+        """
+        Move the ticket to the inactive category if it's idle past its
+        deadline, otherwise (re)schedule it. True if it was moved.
+        """
+        async with self.limit:
+            tckt_chnl = self.bot.get_channel(tckt_chnl_id)
+            # Messages sent while the bot was offline only show up in the
+            # cached channel's last message id.
+            if tckt_chnl and tckt_chnl.last_message_id:
+                await tickets.touch_ticket(
+                    tckt_chnl_id,
+                    discord.utils.snowflake_time(
+                        tckt_chnl.last_message_id
+                    ).timestamp(),
+                )
             if (
-                crnt_tckt["status"] in {"inactive", "closed"}
+                not tckt_chnl
                 or tckt_chnl.category_id == self.inactive_category.id
             ):
-                continue
-
-            if not tckt_chnl.last_message_id:
-                continue
-
-            last_msg = None
-            try:
-                last_msg = await tckt_chnl.fetch_message(
-                    tckt_chnl.last_message_id
-                )
-            except (discord.NotFound, AttributeError):
-                async for msg in tckt_chnl.history(limit=1):
-                    last_msg = msg
-            except discord.Forbidden:
-                botlogger.error(f"No permissions to read {tckt_chnl.name}..")
-                continue
-
-            if not last_msg:
-                continue
-
-            last_msg_time = last_msg.created_at
-            current_time = datetime.datetime.now(datetime.timezone.utc)
-            difference_time = current_time - last_msg_time
+                self.deadlines.cancel(tckt_chnl_id)
+                return False
+
+            crnt_tckt = await tickets.get_ticket(tckt_chnl_id)
+            if not crnt_tckt or crnt_tckt.status != tickets.TicketStatus.OPEN:
+                self.deadlines.cancel(tckt_chnl_id)
+                return False
+            deadline = crnt_tckt.active_at + self.inactive_after
+            if deadline > utcnow().timestamp():
+                self.deadlines.schedule(tckt_chnl_id, deadline)
+                return False
+            # The channel is moved before the transaction, so the ticket
+            # lock is never held while this lane waits on the REST call.
+            await tckt_chnl.edit(category=self.inactive_category)
+            async with tickets.transaction(tckt_chnl_id) as crnt_tckt:
+                if crnt_tckt and crnt_tckt.status == tickets.TicketStatus.OPEN:
+                    crnt_tckt.status = tickets.TicketStatus.INACTIVE
+        botlogger.info(
+            f"Moved inactive ticket {tckt_chnl.name} to the inactive tickets category."
+        )
+        return True
 
-            if (
-                difference_time.total_seconds() > botconfig.inactive_after * 60
-            ):  # Convert both values to seconds
-                if not self.inactive_category:
-                    botlogger.error(
-                        "Inactive category not found, skipping ticket processing."
-                    )
-                    continue
-                await tckt_chnl.edit(category=self.inactive_category)
-                crnt_tckt["status"] = "inactive"
-                await tickets.save_tickets(tickets_dict)
-                botlogger.info(
-                    f"Moved inactive ticket {tckt_chnl.name} to the inactive tickets category."
+    @tasks.loop(minutes=botconfig.inactivity_loop_interval)
+    async def sweep(self):
+        started = time.perf_counter()
+        open_ids = await tickets.get_ticket_ids_by_status(
+            tickets.TicketStatus.OPEN
+        )
+        results = await asyncio.gather(
+            *(self.check(tckt_chnl_id) for tckt_chnl_id in open_ids),
+            return_exceptions=True,
+        )
+        for tckt_chnl_id, result in zip(open_ids, results):
+            if isinstance(result, Exception):
+                botlogger.error(
+                    f"Inactivity check failed for ticket {tckt_chnl_id}.\n{result}"
                 )
-        botlogger.info("Finished inactivity loop.")
+        elapsed = time.perf_counter() - started
+        botlogger.info(
+            f"Inactivity sweep checked {len(open_ids)} open tickets in "
+            f"{elapsed:.2f}s ({len(open_ids) / max(elapsed, 1e-6):.0f} tickets/s), "
+            f"moved {results.count(True)} and tracking {len(self.deadlines)}."
+        )
 
-    @inactive.before_loop
-    async def before_inactive(self):
+    @sweep.before_loop
+    async def before_sweep(self):
         await self.bot.wait_until_ready()
-        self.inactive_category = await self.bot.fetch_channel(
+        self.inactive_category = self.bot.get_channel(
             botconfig.inactive_tickets_category
         )
         if not self.inactive_category:
-            self.inactive_category = self.bot.get_channel(
+            self.inactive_category = await self.bot.fetch_channel(
                 botconfig.inactive_tickets_category
             )
+        ticket_events.subscribe(ticket_events.TicketEvent, self.on_ticket_event)
+        self.deadlines.start()
 
 
 async def setup(bot: commands.Bot):
@@ -7,10 +7,21 @@
 # If not, see https://www.gnu.org/licenses/gpl-3.0.txt
 
 
+import asyncio
 import discord
 import logging
 from discord.ext import commands, tasks
-from utils import tickets, embeds, config, permissions
+from utils import (
+    tickets,
+    embeds,
+    config,
+    permissions,
+    ticket_events,
+    ticket_headers,
+    ratelimit,
+    transcripts,
+    close_jobs,
+)
 
 botconfig = config.load_config()
 botlogger = logging.getLogger("bot")
@@ -19,8 +30,130 @@ botlogger = logging.getLogger("bot")
 class TicketModCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.inactive_ensure.start()
-        self.active_ensure.start()
+        self.reconcile.start()
+        if botconfig.archive_after_days > 0:
+            self.archive_closed.start()
+        ticket_events.subscribe(
+            ticket_events.TicketStatusChanged, self.on_ticket_status_changed
+        )
+
+    async def cog_load(self):
+        self.close_jobs_task = asyncio.create_task(self.start_close_jobs())
+
+    def cog_unload(self):
+        self.reconcile.cancel()
+        self.archive_closed.cancel()
+        close_jobs.stop()
+        ticket_events.unsubscribe(
+            ticket_events.TicketStatusChanged, self.on_ticket_status_changed
+        )
+
+    @ratelimit.background
+    async def on_ticket_status_changed(
+        self, event: ticket_events.TicketStatusChanged
+    ):
+        # Closed tickets are deleted, there is no embed left to update.
+        if isinstance(event, ticket_events.TicketClosed):
+            ticket_headers.forget(event.channel_id)
+            return
+        channel = self.bot.get_channel(event.channel_id)
+        if channel and event.ticket.message_id:
+            await ticket_headers.set_field(
+                channel,
+                event.ticket.message_id,
+                "***Ticket Status***",
+                event.ticket.status.value
+            )
+
+    async def start_close_jobs(self):
+        # Queued jobs need the channel cache, which is filled once ready.
+        await self.bot.wait_until_ready()
+        await close_jobs.start(self.run_close_job)
+
+    @ratelimit.background
+    async def run_close_job(self, job: close_jobs.CloseJob):
+        """Archive and upload the transcript of a closed ticket, then delete its channel."""
+        channel = self.bot.get_channel(job.channel_id)
+        if not channel:
+            # Only give up once Discord confirms the channel is gone, other
+            # errors go back to the queue to be retried.
+            try:
+                channel = await self.bot.fetch_channel(job.channel_id)
+            except discord.NotFound:
+                if job.uploaded:
+                    botlogger.info(
+                        f"Ticket {job.channel_id} was already deleted."
+                    )
+                else:
+                    botlogger.error(
+                        f"Ticket {job.channel_id} was deleted before its "
+                        "transcript was saved, it has no transcript."
+                    )
+                return
+        if not job.uploaded:
+            transcripts_channel = channel.guild.get_channel(
+                botconfig.transcript_channel
+            )
+            async with transcripts.render_transcript(channel) as transcript:
+                ticket = await tickets.get_ticket(job.channel_id)
+                await transcripts.archive_transcript(
+                    transcript,
+                    {
+                        "channel_id": channel.id,
+                        "name": channel.name,
+                        "owner_id": ticket.owner_id if ticket else None,
+                        "claimer_id": ticket.claimer_id if ticket else None,
+                        "closed_by": job.closed_by,
+                        "closed_at": job.closed_at,
+                    },
+                )
+                if transcripts_channel:
+                    await self.upload_transcript(
+                        channel, transcripts_channel, transcript.parts, job
+                    )
+            job.uploaded = True
+            await close_jobs.save()
+            await channel.send(
+                embed=embeds.create_embed(
+                    title="***Ticket closed***",
+                    description="`Ticket will be deleted in 5 seconds..`",
+                )
+            )
+            await asyncio.sleep(5)
+        await channel.delete()
+
+    async def upload_transcript(
+        self,
+        channel: discord.TextChannel,
+        transcripts_channel: discord.TextChannel,
+        parts: list,
+        job: close_jobs.CloseJob,
+    ):
+        staff = channel.guild.get_member(job.closed_by)
+        trnscrpt_embed = embeds.create_embed(
+            title="***Ticket Logged***",
+            timestamp=True,
+            thumbnail=staff.avatar.url if staff and staff.avatar else None,
+        )
+        trnscrpt_embed.add_field(
+            name="`Ticket Name`", value=f"`{channel.name}`", inline=True
+        )
+        trnscrpt_embed.add_field(
+            name="`Ticket Id`", value=f"`{channel.id}`", inline=True
+        )
+        trnscrpt_embed.add_field(
+            name="`Closed By`", value=f"<@{job.closed_by}>", inline=True
+        )
+        # Parts over the first go in their own messages, each one fits
+        # the upload limit.
+        await transcripts_channel.send(
+            embed=trnscrpt_embed,
+            file=discord.File(parts[0], filename=parts[0].name),
+        )
+        for part in parts[1:]:
+            await transcripts_channel.send(
+                file=discord.File(part, filename=part.name)
+            )
 
     @commands.hybrid_command(
         name="add", description="Add a member to the current ticket"
@@ -32,7 +165,7 @@ class TicketModCog(commands.Cog):
         if not current_ticket:
             await ctx.send(embed=embeds.NOT_TCKT, ephemeral=True)
             return
-        elif ctx.author.id != current_ticket["claimer_id"]:
+        elif ctx.author.id != current_ticket.claimer_id:
             await ctx.send(embed=embeds.NOT_CLMR, ephemeral=True)
             return
         elif ctx.author.bot:
@@ -74,7 +207,7 @@ class TicketModCog(commands.Cog):
         if not current_ticket:
             await ctx.send(embed=embeds.NOT_TCKT, ephemeral=True)
             return
-        elif ctx.author.id != current_ticket["claimer_id"]:
+        elif ctx.author.id != current_ticket.claimer_id:
             await ctx.send(embed=embeds.NOT_CLMR, ephemeral=True)
             return
         elif ctx.author.bot:
@@ -104,14 +237,13 @@ class TicketModCog(commands.Cog):
             await msg.delete(delay=5)
 
     @commands.Cog.listener()
+    @ratelimit.background
     async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
-        all_tickets, ticket = await tickets.get_tickets_and_ticket(
-            channel_id=channel.id
-        )  # Both are dict
+        async with tickets.transaction(channel.id) as ticket:
+            if ticket:
+                ticket.status = tickets.TicketStatus.CLOSED
         if ticket:
-            ticket["status"] = "closed"
-            await tickets.save_tickets(all_tickets)
-            member = channel.guild.get_member(ticket["owner_id"])
+            member = channel.guild.get_member(ticket.owner_id)
             if member:
                 try:
                     await member.send(
@@ -127,68 +259,110 @@ class TicketModCog(commands.Cog):
                 f"{channel.name} ({channel.id}) has been deleted and was marked as a Closed ticket."
             )
 
-    @tasks.loop(minutes=5)
-    async def inactive_ensure(self):
-        category = self.bot.get_channel(botconfig.inactive_tickets_category)
-        if category:
-            for channel in category.text_channels:
-                all_tickets, ticket = await tickets.get_tickets_and_ticket(
-                    channel_id=channel.id
+    @commands.Cog.listener()
+    @ratelimit.background
+    async def on_guild_channel_update(
+        self,
+        before: discord.abc.GuildChannel,
+        after: discord.abc.GuildChannel
+    ):
+        # Staff drag tickets between the active and inactive categories.
+        if before.category_id == after.category_id:
+            return
+        if after.category_id == botconfig.inactive_tickets_category:
+            async with tickets.transaction(after.id) as ticket:
+                waitlisted = (
+                    bool(ticket)
+                    and ticket.status == tickets.TicketStatus.OPEN
+                )
+                if waitlisted:
+                    ticket.status = tickets.TicketStatus.INACTIVE
+            if waitlisted:
+                await self.waitlisted(after, ticket)
+        elif after.category_id == botconfig.active_tickets_category:
+            async with tickets.transaction(after.id) as ticket:
+                reopened = (
+                    bool(ticket)
+                    and ticket.status == tickets.TicketStatus.INACTIVE
+                )
+                if reopened:
+                    ticket.status = tickets.TicketStatus.OPEN
+            if reopened:
+                botlogger.info(
+                    f"Ticket {after.name} ({after.id}) has been marked as Open."
                 )
-                if ticket and ticket["status"] not in ["inactive", "closed"]:
-                    ticket["status"] = "inactive"
-                    await tickets.save_tickets(all_tickets)
-                    botlogger.info(
-                        f"Ticket {channel.name} ({channel.id}) has been marked as Inactive."
-                    )
-                    await embeds.update_ticket_embed_field(
-                        channel,
-                        ticket["message_id"],
-                        "***Ticket Status***",
-                        "inactive"
-                    )
-                    owner = channel.guild.get_member(ticket["owner_id"])
-                    if owner:
-                        try:
-                            await owner.send(
-                                embed=embeds.create_embed(
-                                    title=f"***Notification from {channel.guild.name}***",
-                                    description=f"`Your ticket {channel.name} was waitlisted..`",
-                                ),
-                                content=f"{owner.mention}",
-                            )
-                        except (discord.Forbidden, discord.HTTPException):
-                            botlogger.warning(f"Could not DM {owner}.")
-                            continue
-                    await channel.send(embed=embeds.WAITLISTED)
-
-    @inactive_ensure.before_loop
-    async def before_inactive_ensure(self):
-        await self.bot.wait_until_ready()
 
-    @tasks.loop(minutes=6)
-    async def active_ensure(self):
-        category = self.bot.get_channel(botconfig.active_tickets_category)
-        if category:
-            for channel in category.text_channels:
-                all_tickets, ticket = await tickets.get_tickets_and_ticket(
-                    channel_id=channel.id
+    async def waitlisted(self, channel: discord.TextChannel, ticket):
+        botlogger.info(
+            f"Ticket {channel.name} ({channel.id}) has been marked as Inactive."
+        )
+        owner = channel.guild.get_member(ticket.owner_id)
+        if owner:
+            try:
+                await owner.send(
+                    embed=embeds.create_embed(
+                        title=f"***Notification from {channel.guild.name}***",
+                        description=f"`Your ticket {channel.name} was waitlisted..`",
+                    ),
+                    content=f"{owner.mention}",
                 )
-                if ticket and ticket["status"] != "open":
-                    ticket["status"] = "open"
-                    await tickets.save_tickets(all_tickets)
-                    botlogger.info(
-                        f"Ticket {channel.name} ({channel.id}) has been marked as Open."
-                    )
-                    await embeds.update_ticket_embed_field(
-                        channel,
-                        ticket["message_id"],
-                        "***Ticket Status***",
-                        "open"
-                    )
+            except (discord.Forbidden, discord.HTTPException):
+                botlogger.warning(f"Could not DM {owner}.")
+        await channel.send(embed=embeds.WAITLISTED)
+
+    @tasks.loop(hours=1)
+    @ratelimit.background
+    async def reconcile(self):
+        """
+        Catch category moves the listener missed, such as while the bot
+        was offline. Diffs both categories against the status index and
+        saves every change in one write.
+        """
+        inactive_category = self.bot.get_channel(
+            botconfig.inactive_tickets_category
+        )
+        active_category = self.bot.get_channel(
+            botconfig.active_tickets_category
+        )
+        open_ids = await tickets.get_ticket_ids_by_status(
+            tickets.TicketStatus.OPEN
+        )
+        inactive_ids = await tickets.get_ticket_ids_by_status(
+            tickets.TicketStatus.INACTIVE
+        )
+        statuses = {}
+        if inactive_category:
+            for channel in inactive_category.text_channels:
+                if channel.id in open_ids:
+                    statuses[channel.id] = tickets.TicketStatus.INACTIVE
+        if active_category:
+            for channel in active_category.text_channels:
+                if channel.id in inactive_ids:
+                    statuses[channel.id] = tickets.TicketStatus.OPEN
+        if not statuses:
+            return
+
+        changed = await tickets.set_ticket_statuses(statuses)
+        botlogger.info(f"Reconciled the status of {len(changed)} tickets.")
+        for ticket in changed:
+            channel = self.bot.get_channel(ticket.channel_id)
+            if channel and ticket.status == tickets.TicketStatus.INACTIVE:
+                await self.waitlisted(channel, ticket)
+
+    @reconcile.before_loop
+    async def before_reconcile(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(hours=6)
+    async def archive_closed(self):
+        archived = await tickets.archive_closed_tickets(
+            botconfig.archive_after_days
+        )
+        if archived:
+            botlogger.info(f"Moved {archived} closed tickets to the archive.")
 
-    @active_ensure.before_loop
-    async def before_active_ensure(self):
+    @archive_closed.before_loop
+    async def before_archive_closed(self):
         await self.bot.wait_until_ready()
 
 
@@ -0,0 +1,100 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+from discord.ext import commands
+import discord
+from utils import tickets, ticket_events, transcripts, ratelimit
+import logging
+
+botlogger = logging.getLogger("bot")
+
+
+class TranscriptCog(commands.Cog):
+    """
+    Logs the messages and edits of open and inactive tickets as they
+    arrive, so closing a ticket doesn't crawl its whole history.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.caught_up = False
+        # The newest logged message of each ticket before this run, taken
+        # before the gateway connects so live messages can't move it past
+        # the ones sent while the bot was offline.
+        self.resume_after: dict = {}
+        ticket_events.subscribe(
+            ticket_events.TicketCreated, self.on_ticket_created
+        )
+
+    async def cog_load(self):
+        ticket_ids = await tickets.get_ticket_ids_by_status(
+            *tickets.open_statuses
+        )
+        self.resume_after = await transcripts.last_logged_ids(ticket_ids)
+
+    def cog_unload(self):
+        ticket_events.unsubscribe(
+            ticket_events.TicketCreated, self.on_ticket_created
+        )
+
+    async def on_ticket_created(self, event: ticket_events.TicketCreated):
+        transcripts.start(event.channel_id)
+
+    async def is_logged(self, channel_id: int) -> bool:
+        status = await tickets.get_ticket_status(channel_id)
+        return status in tickets.open_statuses
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.guild and await self.is_logged(message.channel.id):
+            transcripts.log_message(message)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        if payload.guild_id and await self.is_logged(payload.channel_id):
+            transcripts.log_edit(
+                payload.channel_id, payload.message_id, payload.data
+            )
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        await transcripts.discard(channel.id)
+
+    @commands.Cog.listener()
+    @ratelimit.background
+    async def on_ready(self):
+        # Log what was sent while the bot was offline, one history page
+        # per ticket that has a log.
+        if self.caught_up:
+            return
+        self.caught_up = True
+        # Searches shouldn't pay for replaying the archive index.
+        await transcripts.load_archive()
+        # Messages logged live since connecting are fetched again here,
+        # the transcript drops the repeats.
+        for tckt_chnl_id, last_id in self.resume_after.items():
+            channel = self.bot.get_channel(tckt_chnl_id)
+            if not channel:
+                continue
+            if channel.last_message_id and channel.last_message_id <= last_id:
+                continue
+            try:
+                async for msg in channel.history(
+                    limit=None, after=discord.Object(id=last_id),
+                    oldest_first=True
+                ):
+                    transcripts.log_message(msg)
+            except discord.HTTPException as e:
+                botlogger.warning(
+                    f"Couldn't catch up the transcript of {channel.name}.\n{e}"
+                )
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(TranscriptCog(bot))
@@ -0,0 +1,468 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+"""
+Offline maintenance of the data directory, run it while the bot is stopped.
+
+    python datatool.py convert --from json --to sqlite
+    python datatool.py compact --format journal --days 30
+    python datatool.py verify --format sqlite
+
+Tickets are streamed one at a time, so memory stays flat however large
+the store is. Files are replaced atomically and the previous version is
+kept in data/snapshots.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator
+from utils.archive import TicketArchive
+from utils.storage import (
+    JournalBackend,
+    Snapshots,
+    SqliteBackend,
+    data_dir,
+    sync_directory,
+    ticket_columns,
+    write_json_atomic,
+)
+from utils.ticket_record import Ticket, TicketStatus
+
+botlogger = logging.getLogger("bot")
+
+formats = ("json", "json-compact", "journal", "sqlite")
+chunk_size = 1 << 16
+batch_size = 1000
+
+
+def iter_json_object(file) -> Iterator[tuple]:
+    """
+    Yield the (key, value) members of the top level object in a JSON
+    file one at a time. Only the current member and one chunk of the file
+    are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read_more() -> bool:
+        nonlocal buffer, pos, eof
+        chunk = file.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not read_more():
+                raise ValueError("Unexpected end of the JSON data")
+
+    def decode():
+        nonlocal pos
+        next_char()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The value may just continue in the next chunk.
+                if not read_more():
+                    raise
+                continue
+            # A number cut by the chunk end parses too, make sure it ended.
+            complete = end < len(buffer) and buffer[end] in " \t\r\n,:}]"
+            if not complete and not eof and read_more():
+                continue
+            pos = end
+            return value
+
+    if next_char() != "{":
+        raise ValueError("Expected a JSON object")
+    pos += 1
+    if next_char() == "}":
+        return
+    while True:
+        key = decode()
+        if not isinstance(key, str) or next_char() != ":":
+            raise ValueError(f"Malformed member near {key!r}")
+        pos += 1
+        yield key, decode()
+        separator = next_char()
+        pos += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or '}}' after {key!r}")
+
+
+def connect_existing(path: Path) -> sqlite3.Connection:
+    # sqlite3.connect would quietly create an empty database.
+    if not path.exists():
+        raise FileNotFoundError(f"{path} doesn't exist")
+    return sqlite3.connect(path)
+
+
+def read_tickets(fmt: str, directory: Path) -> Iterator[tuple]:
+    """Stream (key, ticket dict) pairs out of a store."""
+    if fmt == "sqlite":
+        db = connect_existing(directory / "tickets.db")
+        try:
+            rows = db.execute(
+                f"SELECT {', '.join(ticket_columns)}, extra FROM tickets"
+            )
+            for row in rows:
+                yield str(row[0]), SqliteBackend.from_row(row)
+        finally:
+            db.close()
+        return
+
+    # The journal only holds the changes since the last compaction, it's
+    # small enough to keep in memory while the snapshot is streamed.
+    changes = {}
+    if fmt == "journal":
+        backend = JournalBackend(directory)
+
+        def apply(record: dict) -> None:
+            if "put" in record:
+                changes[str(record["put"]["channel_id"])] = record["put"]
+            elif "delete" in record:
+                changes[str(record["delete"])] = None
+
+        backend.replay(backend.journal_path, apply)
+
+    path = directory / "tickets.json"
+    if path.exists() and path.stat().st_size:
+        with open(path, "r", encoding="utf-8") as file:
+            for key, ticket in iter_json_object(file):
+                if key not in changes:
+                    yield key, ticket
+    for key, ticket in changes.items():
+        if ticket is not None:
+            yield key, ticket
+
+
+def read_blacklist(fmt: str, directory: Path) -> set:
+    if fmt == "sqlite":
+        db = connect_existing(directory / "tickets.db")
+        try:
+            return {
+                row[0] for row in db.execute("SELECT user_id FROM blacklist")
+            }
+        finally:
+            db.close()
+
+    blacklist = set()
+    path = directory / "blacklist.json"
+    if path.exists() and path.stat().st_size:
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        blacklist = {int(user_id) for user_id in data.get("blacklisted", [])}
+    if fmt == "journal":
+        backend = JournalBackend(directory)
+
+        def apply(record: dict) -> None:
+            if "put" in record:
+                blacklist.add(int(record["put"]))
+            elif "delete" in record:
+                blacklist.discard(int(record["delete"]))
+
+        backend.replay(backend.blacklist_journal_path, apply)
+    return blacklist
+
+
+def replace_file(temp_path: Path, path: Path) -> None:
+    """Move temp_path over path, keeping the old file as a snapshot."""
+    if path.exists():
+        Snapshots(path.parent / "snapshots", path.stem, suffix=path.suffix).take(
+            lambda snapshot: shutil.copyfile(path, snapshot)
+        )
+    os.replace(temp_path, path)
+    sync_directory(path.parent)
+
+
+def write_json_tickets(path: Path, tickets: Iterable, indent: bool) -> int:
+    # Writes the same text json.dump would, one ticket at a time.
+    temp_path = path.with_name(path.name + ".tmp")
+    count = 0
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write("{")
+        for key, ticket in tickets:
+            if count:
+                file.write(",")
+            if indent:
+                value = json.dumps(ticket, indent=4).replace("\n", "\n    ")
+                file.write(f"\n    {json.dumps(key)}: {value}")
+            else:
+                value = json.dumps(ticket, separators=(",", ":"))
+                file.write(f"{json.dumps(key)}:{value}")
+            count += 1
+        file.write("\n}" if indent and count else "}")
+        file.flush()
+        os.fsync(file.fileno())
+    replace_file(temp_path, path)
+    return count
+
+
+def write_sqlite(path: Path, tickets: Iterable, blacklist: set) -> int:
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.unlink(missing_ok=True)
+    db = sqlite3.connect(temp_path)
+    count = 0
+    try:
+        db.executescript(SqliteBackend.schema)
+        batch = []
+        for _, ticket in tickets:
+            batch.append(SqliteBackend.to_row(ticket))
+            if len(batch) >= batch_size:
+                count += len(batch)
+                with db:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                batch.clear()
+        count += len(batch)
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            db.executemany(
+                "INSERT OR IGNORE INTO blacklist VALUES (?)",
+                ((user_id,) for user_id in blacklist),
+            )
+        db.execute("PRAGMA journal_mode=WAL")
+    finally:
+        db.close()
+    with open(temp_path, "rb+") as file:
+        os.fsync(file.fileno())
+    replace_file(temp_path, path)
+    # Leftovers of the old database would be applied to the new one.
+    for suffix in ("-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    return count
+
+
+def write_store(fmt: str, directory: Path, tickets: Iterable, blacklist: set) -> int:
+    """Write a whole store in fmt, returns the number of tickets written."""
+    directory.mkdir(parents=True, exist_ok=True)
+    if fmt == "sqlite":
+        return write_sqlite(directory / "tickets.db", tickets, blacklist)
+
+    # The journal format is its snapshot files with an empty journal.
+    indent = fmt != "json-compact"
+    count = write_json_tickets(directory / "tickets.json", tickets, indent)
+    write_json_atomic(
+        directory / "blacklist.json",
+        {"blacklisted": [str(user_id) for user_id in sorted(blacklist)]},
+        indent=4 if indent else None,
+    )
+    # Stale journal records would be replayed over the new files.
+    for name in ("tickets.journal", "blacklist.journal"):
+        path = directory / name
+        if path.exists():
+            with open(path, "w", encoding="utf-8"):
+                pass
+    return count
+
+
+def convert(args) -> int:
+    started = time.perf_counter()
+    out = args.out or args.data
+    blacklist = read_blacklist(args.source, args.data)
+    count = write_store(
+        args.target, out, read_tickets(args.source, args.data), blacklist
+    )
+    print(
+        f"Converted {count} tickets and {len(blacklist)} blacklisted users "
+        f"from {args.source} to {args.target} in "
+        f"{time.perf_counter() - started:.2f}s."
+    )
+    backend = "json" if args.target == "json-compact" else args.target
+    print(f'Set "storage": {{"backend": "{backend}"}} in config.json to use it.')
+    return 0
+
+
+def compact(args) -> int:
+    started = time.perf_counter()
+    archive = TicketArchive(args.data / "archive")
+    archive.load()
+    cutoff = time.time() - args.days * 86400
+    archived = 0
+    batch = []
+    # Tickets are archived before the new store replaces the old one, so
+    # a run that stopped halfway left some in both. Skipping those keeps
+    # a re-run from archiving them twice.
+    already_archived = {
+        str(ticket["channel_id"]) for ticket in archive.iter_tickets()
+    }
+
+    def kept() -> Iterator[tuple]:
+        nonlocal archived
+        for key, data in read_tickets(args.format, args.data):
+            ticket = Ticket.from_dict(data)
+            closed_at = ticket.closed_at or ticket.created_at
+            if ticket.status != TicketStatus.CLOSED or closed_at >= cutoff:
+                yield key, data
+                continue
+            if str(ticket.channel_id) in already_archived:
+                continue
+            batch.append(data)
+            if len(batch) >= batch_size:
+                archive.append(batch)
+                archived += len(batch)
+                batch.clear()
+        if batch:
+            archive.append(batch)
+            archived += len(batch)
+
+    blacklist = read_blacklist(args.format, args.data)
+    count = write_store(args.format, args.data, kept(), blacklist)
+    print(
+        f"Archived {archived} closed tickets, kept {count} in "
+        f"{time.perf_counter() - started:.2f}s."
+    )
+    return 0
+
+
+def verify(args) -> int:
+    started = time.perf_counter()
+    problems = 0
+
+    def problem(message: str) -> None:
+        nonlocal problems
+        problems += 1
+        print(message, file=sys.stderr)
+
+    if args.format == "sqlite":
+        db = connect_existing(args.data / "tickets.db")
+        try:
+            for (result,) in db.execute("PRAGMA integrity_check"):
+                if result != "ok":
+                    problem(f"sqlite : {result}")
+        finally:
+            db.close()
+
+    statuses = Counter()
+    seen = set()
+    try:
+        for key, data in read_tickets(args.format, args.data):
+            try:
+                ticket = Ticket.from_dict(data)
+            except (KeyError, TypeError, ValueError) as e:
+                problem(f"Ticket {key} is invalid : {e!r}")
+                continue
+            if str(ticket.channel_id) != key:
+                problem(f"Ticket {key} has channel_id {ticket.channel_id}.")
+            if ticket.channel_id in seen:
+                problem(f"Ticket {key} is stored more than once.")
+            seen.add(ticket.channel_id)
+            statuses[ticket.status.value] += 1
+    except (ValueError, sqlite3.Error) as e:
+        problem(f"Couldn't read the tickets : {e}")
+
+    try:
+        blacklist = read_blacklist(args.format, args.data)
+    except (ValueError, AttributeError, sqlite3.Error) as e:
+        problem(f"Couldn't read the blacklist : {e}")
+        blacklist = set()
+
+    archive = TicketArchive(args.data / "archive")
+    archive.load()
+    owners = Counter(
+        str(ticket["owner_id"]) for ticket in archive.iter_tickets()
+    )
+    if dict(owners) != archive.summary["owners"]:
+        problem(
+            f"The archive summary counts {archive.count()} tickets but the "
+            f"archive holds {sum(owners.values())}."
+        )
+
+    counts = ", ".join(f"{count} {status}" for status, count in statuses.items())
+    print(
+        f"Checked {len(seen)} tickets ({counts or 'none'}), "
+        f"{len(blacklist)} blacklisted users and {archive.count()} archived "
+        f"tickets in {time.perf_counter() - started:.2f}s : "
+        f"{problems or 'no'} problems."
+    )
+    return 1 if problems else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Offline maintenance of the RaelBot data directory."
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--data", type=Path, default=data_dir,
+        help="the data directory (default: data)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser(
+        "convert", parents=[common],
+        help="convert the tickets and blacklist to another format",
+    )
+    convert_parser.add_argument(
+        "--from", dest="source", choices=formats, required=True
+    )
+    convert_parser.add_argument(
+        "--to", dest="target", choices=formats, required=True
+    )
+    convert_parser.add_argument(
+        "--out", type=Path,
+        help="write to another directory instead of replacing the data",
+    )
+    convert_parser.set_defaults(run=convert)
+
+    compact_parser = commands.add_parser(
+        "compact", parents=[common],
+        help="move old closed tickets to the archive",
+    )
+    compact_parser.add_argument("--format", choices=formats, default="journal")
+    compact_parser.add_argument(
+        "--days", type=int, default=30,
+        help="archive tickets closed more than this many days ago",
+    )
+    compact_parser.set_defaults(run=compact)
+
+    verify_parser = commands.add_parser(
+        "verify", parents=[common],
+        help="check that the stored data is readable and consistent",
+    )
+    verify_parser.add_argument("--format", choices=formats, default="journal")
+    verify_parser.set_defaults(run=verify)
+
+    args = parser.parse_args()
+    logging.basicConfig(format="{levelname} : {message}", style="{")
+    try:
+        return args.run(args)
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print(f"{args.command} failed : {e!r}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
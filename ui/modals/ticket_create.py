@@ -12,6 +12,7 @@ import logging
 from utils import tickets
 from utils import embeds
 from utils import config
+from utils import ticket_headers
 from ui.views.TicketModView import TicketModView
 
 botlogger = logging.getLogger("bot")
@@ -147,12 +148,12 @@ class TicketBuyModal(discord.ui.Modal):
             ),
             (
                 "***Ticket Status***",
-                f"{ticket_created['status']}",
+                f"{ticket_created.status}",
                 True
             ),
             (
                 "***Ticket Purpose***",
-                f"{ticket_created['selected_purpose']}",
+                f"{ticket_created.selected_purpose}",
                 True
             ),
         ]
@@ -194,10 +195,9 @@ class TicketBuyModal(discord.ui.Modal):
                 f"Couldn't send message to ticket : {channel.id}\n{e}"
             )
 
-        all_tickets, ticket = await tickets.get_tickets_and_ticket(channel.id)
         if msg:
-            ticket["message_id"] = msg.id if msg.id else None
-        await tickets.save_tickets(all_tickets)
+            ticket_headers.register(msg)
+            await tickets.set_ticket_message(channel.id, msg.id)
         await interaction.followup.send(embed=embeds.EMBD_SCCS, ephemeral=True)
         botlogger.info(
             f"Created ticket with id ({channel.id}) and name ({channel.name})."
@@ -9,11 +9,9 @@
 
 import discord
 from utils.config import load_config
-from utils import timestmp
 from utils import embeds
-import asyncio
 from utils import tickets
-import io
+from utils import close_jobs
 
 botconfig = load_config()
 
@@ -30,13 +28,14 @@ class TicketModView(discord.ui.View):
             interaction.guild.get_role(botconfig.support_role_id)
             in interaction.user.roles
         ):
-            tickets_dict, claimed_ticket = await tickets.get_tickets_and_ticket(
+            async with tickets.transaction(
                 interaction.channel_id
-            )
+            ) as claimed_ticket:
+                claimed = bool(claimed_ticket) and not claimed_ticket.claimer_id
+                if claimed:
+                    claimed_ticket.claimer_id = interaction.user.id
             if claimed_ticket:
-                if not claimed_ticket["claimer_id"]:
-                    claimed_ticket["claimer_id"] = interaction.user.id
-                    await tickets.save_tickets(tickets_dict)
+                if claimed:
                     await interaction.channel.set_permissions(
                         interaction.user, send_messages=True, view_channel=True
                     )
@@ -89,71 +88,26 @@ class TicketModView(discord.ui.View):
             interaction.guild.get_role(botconfig.support_role_id)
             in interaction.user.roles
         ):
-            tickets_dict, closed_ticket = await tickets.get_tickets_and_ticket(
+            async with tickets.transaction(
                 interaction.channel_id
-            )
+            ) as closed_ticket:
+                is_claimer = (
+                    bool(closed_ticket)
+                    and closed_ticket.claimer_id == interaction.user.id
+                )
+                if is_claimer:
+                    closed_ticket.status = tickets.TicketStatus.CLOSED
             if closed_ticket:
-                if closed_ticket["claimer_id"] == interaction.user.id:
+                if is_claimer:
+                    # The transcript and the deletion run in the close
+                    # queue, the button only has to queue the job.
                     await interaction.response.send_message(
-                        "`Generating ticket transcript..`", ephemeral=True
-                    )
-                    closed_ticket["status"] = "closed"
-                    await tickets.save_tickets(tickets_dict)
-                    messages = [
-                        message
-                        async for message in interaction.channel.history(
-                            limit=None, oldest_first=True
-                        )
-                    ]
-                    output = f"Transcript for {interaction.channel.name} ({interaction.channel.id}) !\nExported on {timestmp.utcnow()}\n{'*'*50}\n\n"
-                    for msg in messages:
-                        msg_timestamp = msg.created_at.strftime("%Y-%m-%d %H:%M:%S")
-                        msg_content = msg.content
-                        if not msg_content and msg.embeds:
-                            msg_content = "[ EMBED CONTENT ]"
-                        output += f"[{msg_timestamp}] {msg.author.name} ({msg.author.id}): {msg_content}\n"
-                        if msg.attachments:
-                            output += f"    [ATTACHMENT: {msg.attachments[0].url}]\n"
-                    final_output_file = io.BytesIO(output.encode("utf-8"))
-                    transcripts_channel = interaction.guild.get_channel(
-                        botconfig.transcript_channel
+                        "`Ticket closed, generating the transcript..`",
+                        ephemeral=True
                     )
-                    if transcripts_channel:
-                        trnscrpt_embed = embeds.create_embed(
-                            title="***Ticket Logged***",
-                            timestamp=True,
-                            thumbnail=interaction.user.avatar.url if interaction.user.avatar else None,
-                        )
-                        trnscrpt_embed.add_field(
-                            name="`Ticket Name`",
-                            value=f"`{interaction.channel.name}`",
-                            inline=True,
-                        )
-                        trnscrpt_embed.add_field(
-                            name="`Ticket Id`",
-                            value=f"`{interaction.channel_id}`",
-                            inline=True,
-                        )
-                        trnscrpt_embed.add_field(
-                            name="`Closed By`",
-                            value=f"{interaction.user.mention}",
-                            inline=True,
-                        )
-                        file_trnscrpt = discord.File(
-                            final_output_file,
-                            filename=f"transcript-{interaction.channel.name}.txt",
-                        )
-                        await transcripts_channel.send(
-                            embed=trnscrpt_embed, file=file_trnscrpt
-                        )
-                    await interaction.channel.send(
-                        embed=embeds.create_embed(
-                            title="***Ticket closed***",
-                            description="`Ticket will be deleted in 5 seconds..`",
-                        )
+                    await close_jobs.enqueue(
+                        interaction.channel_id, interaction.user.id
                     )
-                    await asyncio.sleep(5)
-                    await interaction.channel.delete()
                 else:
                     await interaction.response.send_message(
                         "`You are not the claimer to close this ticket.`",
@@ -185,28 +139,48 @@ class TransferSelect(discord.ui.UserSelect):
         target_staff: discord.Member = self.values[0]
         staff_role = interaction.guild.get_role(botconfig.support_role_id)
         if staff_role in interaction.user.roles:
-            tickets_dict, trnsfrd_ticket = await tickets.get_tickets_and_ticket(
-                interaction.channel_id
+            valid_target = (
+                staff_role in target_staff.roles
+                and not target_staff.bot
+                and target_staff.id != interaction.user.id
             )
+            async with tickets.transaction(
+                interaction.channel_id
+            ) as trnsfrd_ticket:
+                is_claimer = (
+                    bool(trnsfrd_ticket)
+                    and trnsfrd_ticket.claimer_id == interaction.user.id
+                )
+                if is_claimer and valid_target:
+                    trnsfrd_ticket.claimer_id = target_staff.id
+            if is_claimer and valid_target:
+                # The permissions are edited after the commit so the ticket
+                # lock isn't held over REST calls, if one fails the ticket
+                # goes back to its claimer.
+                try:
+                    await interaction.channel.set_permissions(
+                        target_staff, send_messages=True, view_channel=True
+                    )
+                    await interaction.channel.set_permissions(
+                        staff_role, send_messages=False, view_channel=True
+                    )
+                    await interaction.channel.set_permissions(
+                        interaction.user, send_messages=False,
+                        view_channel=True
+                    )
+                except discord.HTTPException:
+                    async with tickets.transaction(
+                        interaction.channel_id
+                    ) as reverted_ticket:
+                        if (
+                            reverted_ticket
+                            and reverted_ticket.claimer_id == target_staff.id
+                        ):
+                            reverted_ticket.claimer_id = interaction.user.id
+                    raise
             if trnsfrd_ticket:
-                if trnsfrd_ticket["claimer_id"] == interaction.user.id:
-                    if (
-                        staff_role in target_staff.roles
-                        and not target_staff.bot
-                        and target_staff.id != interaction.user.id
-                    ):
-                        await interaction.channel.set_permissions(
-                            target_staff, send_messages=True, view_channel=True
-                        )
-                        await interaction.channel.set_permissions(
-                            staff_role, send_messages=False, view_channel=True
-                        )
-                        await interaction.channel.set_permissions(
-                            interaction.user, send_messages=False,
-                            view_channel=True
-                        )
-                        trnsfrd_ticket["claimer_id"] = target_staff.id
-                        await tickets.save_tickets(tickets_dict)
+                if is_claimer:
+                    if valid_target:
                         await interaction.response.send_message(
                             embed=embeds.create_embed(
                                 title="***This ticket has been transfered !***",
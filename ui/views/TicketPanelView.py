@@ -13,6 +13,7 @@ from utils import tickets
 from ui.modals.ticket_create import TicketBuyModal
 from utils.config import load_config
 from utils import embeds
+from utils import ticket_headers
 from ui.views.TicketModView import TicketModView
 
 
@@ -162,12 +163,12 @@ class TicketPanelView(discord.ui.View):
             fields = [
                 (
                     "***Ticket Status***",
-                    f"{ticket_created['status']}",
+                    f"{ticket_created.status}",
                     True
                 ),
                 (
                     "***Ticket Purpose***",
-                    f"{ticket_created['selected_purpose']}",
+                    f"{ticket_created.selected_purpose}",
                     True
                 ),
             ]
@@ -192,12 +193,9 @@ class TicketPanelView(discord.ui.View):
                     f"Couldn't send message to ticket : {channel.id}\n{e}"
                 )
 
-            all_tickets, ticket = await tickets.get_tickets_and_ticket(
-                channel_id=channel.id
-            )
             if msg:
-                ticket["message_id"] = msg.id if msg.id else None
-            await tickets.save_tickets(all_tickets)
+                ticket_headers.register(msg)
+                await tickets.set_ticket_message(channel.id, msg.id)
             await interaction.followup.send(
                 embed=embeds.EMBD_SCCS,
                 ephemeral=True
@@ -0,0 +1,147 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+import gzip
+import json
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+from utils.storage import write_json_atomic
+from utils.ticket_record import from_epoch, to_epoch
+
+botlogger = logging.getLogger("bot")
+archive_dir = Path("data/archive")
+
+
+class TicketArchive:
+    """
+    Cold storage for old closed tickets.
+
+    Tickets are appended as gzip JSONL to one file per creation month,
+    tickets-YYYY-MM.jsonl.gz. A small summary.json keeps the total and
+    per-owner counts, so counting never has to open the archive files.
+    Methods do blocking I/O and are meant to run off the event loop.
+    """
+
+    def __init__(self, directory: Path = archive_dir):
+        self.directory = directory
+        self.summary_path = directory / "summary.json"
+        self.summary = {"total": 0, "owners": {}, "last_batch": []}
+
+    def load(self) -> None:
+        if not self.summary_path.exists():
+            if self.directory.exists() and any(self.directory.glob("*.gz")):
+                self.rebuild_summary()
+            return
+        try:
+            with open(self.summary_path, "r", encoding="utf-8") as file:
+                self.summary.update(json.load(file))
+        except ValueError as e:
+            botlogger.error(
+                f"{self.summary_path} is corrupted, rebuilding it.\n{e}"
+            )
+            self.rebuild_summary()
+
+    def rebuild_summary(self) -> None:
+        """Recount the archive files, the review check relies on these counts."""
+        owners = Counter()
+        for ticket in self.iter_tickets():
+            owners[str(ticket["owner_id"])] += 1
+        self.summary = {
+            "total": sum(owners.values()),
+            "owners": dict(owners),
+            "last_batch": [],
+        }
+        write_json_atomic(self.summary_path, self.summary, indent=None)
+
+    @staticmethod
+    def partition(ticket: dict) -> str:
+        created_at = datetime.fromisoformat(str(ticket["created_at"]))
+        return f"tickets-{created_at:%Y-%m}.jsonl.gz"
+
+    def append(self, tickets: list) -> None:
+        """Archive tickets, grouped into their monthly files."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partitions: dict[str, list] = {}
+        for ticket in tickets:
+            partitions.setdefault(self.partition(ticket), []).append(ticket)
+        for name, batch in partitions.items():
+            # Appending adds a gzip member, readers see one stream.
+            with open(self.directory / name, "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab") as file:
+                    for ticket in batch:
+                        file.write(
+                            json.dumps(ticket, separators=(",", ":")).encode()
+                            + b"\n"
+                        )
+                raw.flush()
+                os.fsync(raw.fileno())
+
+        summary = self.summary
+        owners = Counter(summary["owners"])
+        owners.update(str(ticket["owner_id"]) for ticket in tickets)
+        summary["owners"] = dict(owners)
+        summary["total"] += len(tickets)
+        # Lets a retry after a crash tell which tickets already made it here.
+        summary["last_batch"] = [str(ticket["channel_id"]) for ticket in tickets]
+        write_json_atomic(self.summary_path, summary, indent=None)
+
+    def already_archived(self, channel_id: int | str) -> bool:
+        return str(channel_id) in self.summary["last_batch"]
+
+    def count(self) -> int:
+        return self.summary["total"]
+
+    def count_for_owner(self, owner_id: int) -> int:
+        return self.summary["owners"].get(str(owner_id), 0)
+
+    def iter_tickets(
+        self,
+        owner_id: Optional[int] = None,
+        since: Optional[datetime | float] = None,
+        until: Optional[datetime | float] = None,
+    ) -> Iterator[dict]:
+        """
+        Stream archived tickets, oldest month first. since and until
+        bound the creation time and skip whole files outside the range,
+        they are datetimes (naive ones are UTC) or epoch seconds.
+        """
+        if not self.directory.exists():
+            return
+        since = to_epoch(since)
+        until = to_epoch(until)
+        for path in sorted(self.directory.glob("tickets-*.jsonl.gz")):
+            month = path.name[len("tickets-"):len("tickets-YYYY-MM")]
+            if since is not None and month < f"{from_epoch(since):%Y-%m}":
+                continue
+            if until is not None and month > f"{from_epoch(until):%Y-%m}":
+                continue
+            # A retried batch can repeat tickets, always in the same file.
+            seen = set()
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as file:
+                    for line in file:
+                        ticket = json.loads(line)
+                        if ticket["channel_id"] in seen:
+                            continue
+                        seen.add(ticket["channel_id"])
+                        if owner_id is not None and ticket["owner_id"] != owner_id:
+                            continue
+                        created_at = to_epoch(ticket["created_at"])
+                        if since is not None and created_at < since:
+                            continue
+                        if until is not None and created_at > until:
+                            continue
+                        yield ticket
+            except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+                # Only the member being written during a crash can be torn.
+                botlogger.warning(f"Stopped reading a torn archive {path}.\n{e}")
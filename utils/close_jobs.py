@@ -0,0 +1,188 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+from utils.config import load_config
+from utils.storage import write_json_atomic
+from utils.timestmp import utcnow
+import asyncio
+import json
+import logging
+
+botlogger = logging.getLogger("bot")
+botconfig = load_config()
+jobs_path = Path("data/close_jobs.json")
+# A failed job waits retry_delay * 2 ** (attempts - 1) seconds.
+retry_delay = 5.0
+
+
+class CloseJob:
+    """
+    Closing one ticket: upload its transcript, then delete its channel.
+    uploaded is saved as soon as the transcript is sent, so a retry or a
+    restart never uploads it twice and the channel is never deleted first.
+    """
+
+    __slots__ = ("channel_id", "closed_by", "closed_at", "uploaded", "attempts")
+
+    def __init__(
+        self,
+        channel_id: int,
+        closed_by: int,
+        closed_at: float,
+        uploaded: bool = False,
+        attempts: int = 0,
+    ):
+        self.channel_id = channel_id
+        self.closed_by = closed_by
+        self.closed_at = closed_at
+        self.uploaded = uploaded
+        self.attempts = attempts
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CloseJob":
+        return cls(**data)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return (
+            f"CloseJob(channel_id={self.channel_id}, "
+            f"uploaded={self.uploaded}, attempts={self.attempts})"
+        )
+
+
+Handler = Callable[[CloseJob], Awaitable[None]]
+
+# Jobs by channel id in the order they were queued, saved on every change.
+_jobs: dict[int, CloseJob] = {}
+_queue: Optional[asyncio.Queue] = None
+_workers: list = []
+_retries: set = set()
+_io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="close-jobs-io")
+
+
+async def _run_io(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, partial(func, *args))
+
+
+def _load() -> list:
+    if not jobs_path.exists():
+        return []
+    try:
+        with open(jobs_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except ValueError as e:
+        botlogger.error(f"{jobs_path} is corrupted, close jobs were lost.\n{e}")
+        return []
+
+
+def _write(data: list) -> None:
+    jobs_path.parent.mkdir(parents=True, exist_ok=True)
+    write_json_atomic(jobs_path, data)
+
+
+async def save() -> None:
+    """Persist every queued job, call after changing one."""
+    await _run_io(_write, [job.to_dict() for job in _jobs.values()])
+
+
+async def _try_save() -> bool:
+    # The jobs in memory keep running when the file can't be written,
+    # only a restart would lose them.
+    try:
+        await save()
+    except OSError as e:
+        botlogger.error(f"Couldn't save the close jobs to {jobs_path}.\n{e}")
+        return False
+    return True
+
+
+async def enqueue(channel_id: int, closed_by: int) -> bool:
+    """
+    Queue a ticket to be closed, saved before returning so it survives a
+    restart. If the save fails the job still runs. False if the ticket
+    is already queued.
+    """
+    if channel_id in _jobs:
+        return False
+    job = CloseJob(channel_id, closed_by, utcnow().timestamp())
+    _jobs[channel_id] = job
+    await _try_save()
+    if _queue is not None:
+        _queue.put_nowait(job)
+    return True
+
+
+async def start(handler: Handler) -> None:
+    """Load the saved jobs and run them on close_workers workers."""
+    global _queue
+    if _queue is not None:
+        return
+    _queue = asyncio.Queue()
+    for data in await _run_io(_load):
+        job = CloseJob.from_dict(data)
+        _jobs.setdefault(job.channel_id, job)
+    for job in _jobs.values():
+        _queue.put_nowait(job)
+    if _jobs:
+        botlogger.info(f"Resuming {len(_jobs)} queued ticket closes.")
+    for _ in range(botconfig.close_workers):
+        _workers.append(asyncio.create_task(_work(_queue, handler)))
+
+
+def stop() -> None:
+    global _queue
+    for task in (*_workers, *_retries):
+        task.cancel()
+    _workers.clear()
+    _queue = None
+
+
+async def _work(queue: asyncio.Queue, handler: Handler) -> None:
+    # The queue is passed in, stop() clears _queue while a job may be
+    # running.
+    while True:
+        job = await queue.get()
+        try:
+            await handler(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await _failed(job)
+        else:
+            _jobs.pop(job.channel_id, None)
+            await _try_save()
+        finally:
+            queue.task_done()
+
+
+async def _failed(job: CloseJob) -> None:
+    job.attempts += 1
+    if job.attempts > botconfig.close_retries:
+        botlogger.exception(f"Giving up on {job!r}.")
+        _jobs.pop(job.channel_id, None)
+        await _try_save()
+        return
+    botlogger.exception(f"{job!r} failed, retrying.")
+    await _try_save()
+    task = asyncio.create_task(_retry(job))
+    _retries.add(task)
+    task.add_done_callback(_retries.discard)
+
+
+async def _retry(job: CloseJob) -> None:
+    await asyncio.sleep(retry_delay * 2 ** (job.attempts - 1))
+    if _queue is not None:
+        _queue.put_nowait(job)
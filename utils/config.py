@@ -58,6 +58,15 @@ class Config:
         self.inactivity_loop_interval: int = int(
             self._tickets_data["inactivity_loop_interval_minutes"]
         )
+        self.inactivity_concurrency: int = max(
+            1, int(self._tickets_data.get("inactivity_concurrency", 5))
+        )
+        self.close_workers: int = max(
+            1, int(self._tickets_data.get("close_workers", 2))
+        )
+        self.close_retries: int = max(
+            0, int(self._tickets_data.get("close_retries", 5))
+        )
         self.tickets_limit: int = int(
             self._tickets_data["total_tickets_limit"]
         )
@@ -68,6 +77,46 @@ class Config:
             self._tickets_data["reviews_channel_id"]
         )
 
+        self._storage_data: dict = data.get("storage", {})
+        self.storage_backend: str = (
+            v
+            if (v := self._storage_data.get("backend"))
+            in {"json", "journal", "sqlite"}
+            else "journal"
+        )
+        self.archive_after_days: int = int(
+            self._storage_data.get("archive_closed_after_days", 30)
+        )
+
+        self._rate_limit_data: dict = data.get("rate_limit", {})
+        self.rest_rate: float = max(
+            1.0, float(self._rate_limit_data.get("requests_per_second", 40))
+        )
+        self.rest_background_share: float = min(
+            1.0,
+            max(0.05, float(self._rate_limit_data.get("background_share", 0.25))),
+        )
+
+        self._transcripts_data: dict = data.get("transcripts", {})
+        self.transcript_format: str = (
+            v
+            if (v := self._transcripts_data.get("format")) in {"text", "html"}
+            else "html"
+        )
+        self.transcript_compression: str = (
+            v
+            if (v := self._transcripts_data.get("compression"))
+            in {"none", "gzip", "zip"}
+            else "gzip"
+        )
+        self.transcript_upload_limit: int = int(
+            max(1.0, float(self._transcripts_data.get("upload_limit_mb", 10)))
+            * 1024 * 1024
+        )
+        self.transcript_render_workers: int = max(
+            1, int(self._transcripts_data.get("render_workers", 1))
+        )
+
         self._ticket_panel_data: dict = data["ticket_panel"]
         self.t_embed_title: str = self._ticket_panel_data["title"]
         self.t_embed_description: str = self._ticket_panel_data["description"]
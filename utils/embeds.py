@@ -124,42 +124,6 @@ def create_embed(
     return embed
 
 
-async def update_ticket_embed_field(
-    channel: discord.TextChannel,
-    message_id: int,
-    field_name: str,
-    new_value: str,
-):
-    try:
-        msg = await channel.fetch_message(message_id)
-        embed = msg.embeds[0]
-        fields = [(f.name, f.value, f.inline) for f in embed.fields]
-        for i, (name, value, inline) in enumerate(fields):
-            if name == field_name:
-                fields[i] = (name, new_value, inline)
-                break
-        else:
-            fields.append((field_name, new_value, True))
-
-        new_embed = create_embed(
-            title=embed.title, description=embed.description
-        )
-        if embed.thumbnail:
-            new_embed.set_thumbnail(url=embed.thumbnail.url)
-        if embed.image:
-            new_embed.set_image(url=embed.image.url)
-        if embed.footer:
-            new_embed.set_footer(
-                text=embed.footer.text,
-                icon_url=embed.footer.icon_url
-            )
-        for name, value, inline in fields:
-            new_embed.add_field(name=name, value=value, inline=inline)
-        await msg.edit(embed=new_embed)
-    except Exception as e:
-        botlogger.warning(f"Failed to update embed field: {e}")
-
-
 # Put the function in a class to make the usage in the rest of
 # the code readable
 class Replacer:
@@ -445,6 +409,17 @@ HELP = create_embed(
             "Remove a member from the blacklist and restore ticket and review access.",
             False
         ),
+        (
+            "`/search_transcripts <query>`",
+            "Search the archived transcripts of closed tickets.\n"
+            "Optional: owner, claimer, closed within the last days",
+            False
+        ),
+        (
+            "`/archived_transcript <ticket_id>`",
+            "Get the transcript of an archived ticket.",
+            False
+        ),
         (
             "`/help`",
             "Display this help menu.",
@@ -0,0 +1,163 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import wraps
+from utils.config import load_config
+import asyncio
+import logging
+import time
+
+botlogger = logging.getLogger("bot")
+botconfig = load_config()
+
+
+class Lane(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+# The lane of the running task, anything not marked background is treated
+# as a user waiting on the answer.
+current_lane: ContextVar[Lane] = ContextVar("rest_lane", default=Lane.INTERACTIVE)
+
+
+class RestBudget:
+    """
+    A token bucket of REST requests per second shared by the whole bot.
+
+    Interactive requests never wait here, they spend a token and may put
+    the bucket in debt. Background requests queue until a token is free
+    and also stay under background_share of the rate, so housekeeping
+    backs off whenever users are busy. Discord's own per-route limits are
+    still handled by discord.py underneath.
+    """
+
+    def __init__(self, rate: float, background_share: float):
+        self.rate = rate
+        self.background_rate = rate * background_share
+        self.tokens = rate
+        self.background_tokens = self.background_rate
+        self.updated = time.monotonic()
+        self.queue = asyncio.Lock()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.rate, self.tokens + elapsed * self.rate)
+        self.background_tokens = min(
+            self.background_rate,
+            self.background_tokens + elapsed * self.background_rate,
+        )
+
+    def spend_interactive(self) -> None:
+        self.refill()
+        # Capped so a burst can't starve the background lane for long.
+        self.tokens = max(-self.rate, self.tokens - 1)
+
+    async def spend_background(self) -> None:
+        # The lock keeps background requests in arrival order.
+        async with self.queue:
+            while True:
+                self.refill()
+                if self.tokens >= 1 and self.background_tokens >= 1:
+                    self.tokens -= 1
+                    self.background_tokens -= 1
+                    return
+                await asyncio.sleep(
+                    max(
+                        (1 - self.tokens) / self.rate,
+                        (1 - self.background_tokens) / self.background_rate,
+                    )
+                )
+
+    async def spend(self, lane: Lane) -> None:
+        if lane == Lane.BACKGROUND:
+            await self.spend_background()
+        else:
+            self.spend_interactive()
+
+
+budget = RestBudget(botconfig.rest_rate, botconfig.rest_background_share)
+
+
+def background(func):
+    """Run a coroutine function's REST requests in the background lane."""
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = current_lane.set(Lane.BACKGROUND)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            current_lane.reset(token)
+
+    return wrapper
+
+
+def install(http) -> None:
+    """Route every request of a discord.py HTTPClient through the budget."""
+    request = http.request
+
+    async def budgeted_request(route, **kwargs):
+        await budget.spend(current_lane.get())
+        return await request(route, **kwargs)
+
+    http.request = budgeted_request
+    botlogger.info(
+        f"REST budget : {budget.rate:g} requests/s, "
+        f"{budget.background_rate:g} of them for background work."
+    )
+
+
+async def _check() -> None:
+    # python -m utils.ratelimit : sends a background burst and then an
+    # interactive burst through a fake HTTPClient and checks the lanes.
+    global budget
+    budget = RestBudget(20, 0.25)
+
+    class FakeHTTP:
+        def __init__(self):
+            self.sent = []
+
+        async def request(self, route, **kwargs):
+            self.sent.append((route, time.monotonic()))
+
+    http = FakeHTTP()
+    install(http)
+
+    @background
+    async def chore(number: int):
+        await http.request(f"background {number}")
+
+    started = time.monotonic()
+    chores = [asyncio.create_task(chore(number)) for number in range(10)]
+    await asyncio.sleep(0.5)
+    for number in range(30):
+        await http.request(f"interactive {number}")
+    await asyncio.gather(*chores)
+
+    interactive = [at for route, at in http.sent if route.startswith("interactive")]
+    later = [
+        at for route, at in http.sent
+        if route.startswith("background") and at > interactive[-1]
+    ]
+    # Interactive requests never wait on the budget.
+    assert interactive[-1] - interactive[0] < 0.05
+    # Background requests stay under their share, 5/s after a burst of 5.
+    assert http.sent[-1][1] - started >= (10 - 5) / budget.background_rate - 0.05
+    # And wait for the debt left by the interactive burst to be paid back.
+    assert later and later[0] - interactive[-1] >= 0.4
+    print(f"Lanes OK, {len(http.sent)} requests in {time.monotonic() - started:.2f}s.")
+
+
+if __name__ == "__main__":
+    asyncio.run(_check())
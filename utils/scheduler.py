@@ -0,0 +1,94 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+from heapq import heappop, heappush
+from typing import Awaitable, Callable, Hashable, Optional
+import asyncio
+import logging
+import time
+
+botlogger = logging.getLogger("bot")
+
+
+class DeadlineScheduler:
+    """
+    Calls callback(key) once the deadline of key passes.
+
+    Deadlines are epoch seconds kept in a min-heap, the scheduler sleeps
+    until the earliest one and does nothing while none are due. Pushing
+    a deadline later only updates a dict, the heap entry is a lower bound
+    that gets re-queued with the real deadline when it comes up, so a
+    busy ticket doesn't grow the heap with every message.
+    """
+
+    def __init__(self, callback: Callable[[Hashable], Awaitable[None]]):
+        self.callback = callback
+        self.deadlines: dict = {}
+        self.heap: list = []
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.running: set = set()
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        current = self.deadlines.get(key)
+        self.deadlines[key] = deadline
+        if current is None or deadline < current:
+            heappush(self.heap, (deadline, key))
+            if self.heap[0][1] == key:
+                self.wakeup.set()
+
+    def cancel(self, key: Hashable) -> None:
+        # The heap entry is skipped once it comes up.
+        self.deadlines.pop(key, None)
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+
+    async def run(self) -> None:
+        while True:
+            if not self.heap:
+                delay = None
+            else:
+                deadline, key = self.heap[0]
+                delay = deadline - time.time()
+                if delay <= 0:
+                    heappop(self.heap)
+                    self.pop_due(deadline, key)
+                    continue
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def pop_due(self, deadline: float, key: Hashable) -> None:
+        current = self.deadlines.get(key)
+        if current is None:
+            return
+        if current > deadline:
+            heappush(self.heap, (current, key))
+            return
+        del self.deadlines[key]
+        task = asyncio.create_task(self.fire(key))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def fire(self, key: Hashable) -> None:
+        try:
+            await self.callback(key)
+        except Exception:
+            botlogger.exception(f"Scheduled callback failed for {key}.")
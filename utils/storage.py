@@ -0,0 +1,630 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+import copy
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+botlogger = logging.getLogger("bot")
+
+data_dir = Path("data")
+default_data = {}
+default_blacklist_data = {"blacklisted": []}
+storage_errors = (OSError, sqlite3.Error)
+ticket_columns = (
+    "channel_id",
+    "owner_id",
+    "claimer_id",
+    "message_id",
+    "selected_purpose",
+    "status",
+    "created_at",
+)
+
+
+def write_json_atomic(path: Path, data, indent: Optional[int] = 4) -> None:
+    """
+    Write data to a temp file, fsync it and rename it over path, so
+    readers see either the old or the new file but never half of one.
+    """
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=indent)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    sync_directory(path.parent)
+
+
+def sync_directory(directory: Path) -> None:
+    # Makes the rename itself durable, not supported on Windows.
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Snapshots:
+    """
+    Rolling point-in-time copies of one store file in data/snapshots.
+
+    A snapshot is taken at most every interval seconds and only the
+    newest keep are kept. When the live file can't be read, the store is
+    recovered from the newest snapshot that still loads instead of being
+    reset to empty.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        suffix: str = ".json",
+        keep: int = 5,
+        interval: float = 3600.0,
+    ):
+        self.directory = directory
+        self.name = name
+        self.suffix = suffix
+        self.keep = keep
+        self.interval = interval
+        self.taken: Optional[float] = None
+
+    def due(self) -> bool:
+        return self.taken is None or time.monotonic() - self.taken >= self.interval
+
+    def take(self, write: Callable[[Path], None]) -> None:
+        """Call write with the path of a new snapshot, then prune old ones."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S-%f")
+        write(self.directory / f"{self.name}-{stamp}{self.suffix}")
+        self.taken = time.monotonic()
+        for path in self.newest_first()[self.keep:]:
+            path.unlink(missing_ok=True)
+
+    def newest_first(self) -> list:
+        if not self.directory.exists():
+            return []
+        return sorted(
+            self.directory.glob(f"{self.name}-*{self.suffix}"), reverse=True
+        )
+
+    def recover(self, load: Callable[[Path], object]):
+        """
+        The newest snapshot load accepts, as a (path, data) pair, or None.
+        load should raise ValueError or OSError for a bad snapshot.
+        """
+        for path in self.newest_first():
+            try:
+                return path, load(path)
+            except (OSError, ValueError, sqlite3.DatabaseError) as e:
+                botlogger.warning(f"Skipped the unreadable snapshot {path}.\n{e}")
+        return None
+
+
+class StorageBackend:
+    """
+    Where utils.tickets persists its data.
+
+    Tickets are passed around in their on-disk form, the dicts made by
+    Ticket.to_dict, keyed by the stringified channel id. Backends are
+    synchronous, the ticket store decides when to call them.
+    """
+
+    name = "base"
+
+    def load_tickets(self) -> dict:
+        raise NotImplementedError
+
+    def needs_all_tickets(self, changed: Optional[set]) -> bool:
+        """Whether write_tickets needs every ticket or only the changed ones."""
+        return changed is None
+
+    def write_tickets(self, tickets: dict, changed: Optional[set] = None) -> None:
+        """
+        Persist tickets. changed holds the channel ids that were touched
+        since the last write, None means anything could have changed.
+        Unless needs_all_tickets says otherwise, tickets only holds the
+        changed tickets, a changed id missing from it was deleted.
+        """
+        raise NotImplementedError
+
+    def load_blacklist(self) -> set:
+        raise NotImplementedError
+
+    def write_blacklist(self, blacklist: set, changed: Optional[set] = None) -> None:
+        """
+        Persist the blacklisted user ids. changed holds the ids that were
+        added or removed, None means the whole set should be written.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class JsonBackend(StorageBackend):
+    name = "json"
+    snapshot_interval = 3600.0
+
+    def __init__(self, directory: Path = data_dir):
+        self.directory = directory
+        self.tickets_path = directory / "tickets.json"
+        self.blacklist_path = directory / "blacklist.json"
+        self.snapshots = {
+            path: Snapshots(
+                directory / "snapshots",
+                path.stem,
+                interval=self.snapshot_interval,
+            )
+            for path in (self.tickets_path, self.blacklist_path)
+        }
+
+    def ensure(self, path: Path, default: dict) -> None:
+        # An empty file is left to load, it's recovered like corrupted data.
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(default, file, indent=4)
+
+    def keep_corrupted(self, path: Path, name: str) -> None:
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            data = file.read()
+        with open(
+            self.directory / f"corrupted_{name}.txt", "a", encoding="utf-8"
+        ) as corrupted_file:
+            corrupted_file.write(data)
+
+    @staticmethod
+    def read(path: Path, valid: Callable[[object], bool]):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if not valid(data):
+            raise ValueError(f"Unexpected data in {path}")
+        return data
+
+    def load(self, path: Path, default: dict, valid: Callable[[object], bool]):
+        """
+        Read the json store at path. If it's corrupted, its bytes are kept
+        in corrupted_*.txt and it's restored from the newest valid
+        snapshot, it's only reset to default when there is none.
+        """
+        self.ensure(path, default)
+        try:
+            return self.read(path, valid)
+        except ValueError as e:
+            botlogger.error(f"{path} is corrupted.\n{e}")
+        started = time.perf_counter()
+        self.keep_corrupted(path, path.stem)
+        recovered = self.snapshots[path].recover(
+            lambda snapshot: self.read(snapshot, valid)
+        )
+        if recovered is None:
+            botlogger.error(f"No valid snapshot of {path}, starting empty.")
+            data = copy.deepcopy(default)
+        else:
+            snapshot, data = recovered
+            botlogger.warning(
+                f"Recovered {path} from {snapshot.name} in "
+                f"{time.perf_counter() - started:.2f}s."
+            )
+        write_json_atomic(path, data)
+        return data
+
+    def snapshot(self, path: Path, data) -> None:
+        snapshots = self.snapshots[path]
+        if snapshots.due():
+            snapshots.take(
+                lambda snapshot: write_json_atomic(snapshot, data, indent=None)
+            )
+
+    def load_tickets(self) -> dict:
+        return self.load(
+            self.tickets_path, default_data, lambda data: isinstance(data, dict)
+        )
+
+    def needs_all_tickets(self, changed: Optional[set]) -> bool:
+        return True
+
+    def write_tickets(self, tickets: dict, changed: Optional[set] = None) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(self.tickets_path, tickets)
+        self.snapshot(self.tickets_path, tickets)
+
+    def load_blacklist(self) -> set:
+        data = self.load(
+            self.blacklist_path,
+            default_blacklist_data,
+            lambda data: isinstance(data, dict)
+            and isinstance(data.get("blacklisted"), list),
+        )
+        # A malformed id, such as one broken by a hand edit, is set aside
+        # in corrupted_blacklist.txt instead of keeping the bot from starting.
+        blacklist = set()
+        corrupted = []
+        for user_id in data["blacklisted"]:
+            try:
+                blacklist.add(int(user_id))
+            except (TypeError, ValueError):
+                botlogger.warning(
+                    f"Skipped the malformed blacklist entry {user_id!r}."
+                )
+                corrupted.append(json.dumps(user_id, default=str) + "\n")
+        if corrupted:
+            with open(
+                self.directory / "corrupted_blacklist.txt", "a", encoding="utf-8"
+            ) as corrupted_file:
+                corrupted_file.writelines(corrupted)
+        return blacklist
+
+    def write_blacklist(self, blacklist: set, changed: Optional[set] = None) -> None:
+        # The file keeps the ids as strings like it always did.
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data = {"blacklisted": [str(user_id) for user_id in sorted(blacklist)]}
+        write_json_atomic(self.blacklist_path, data)
+        self.snapshot(self.blacklist_path, data)
+
+
+class JournalBackend(JsonBackend):
+    """
+    The json files as snapshots, each with an append-only journal.
+
+    Every write appends one JSON line per changed ticket or blacklisted
+    id, so its cost follows the size of the change instead of the whole
+    store. Once a journal holds compact_every records it is folded into a
+    new snapshot. Loading replays the journal on top of the snapshot, a
+    torn last line from a crash mid-write is dropped instead of failing
+    the whole load.
+    """
+
+    name = "journal"
+    compact_every = 1000
+    # A rolling snapshot at every compaction, so a corrupted json file is
+    # rebuilt from the newest one plus the journal without losing changes.
+    snapshot_interval = 0.0
+
+    def __init__(self, directory: Path = data_dir):
+        super().__init__(directory)
+        self.journal_path = directory / "tickets.journal"
+        self.blacklist_journal_path = directory / "blacklist.journal"
+        self.journal_records = {
+            self.journal_path: 0,
+            self.blacklist_journal_path: 0,
+        }
+
+    def replay(self, path: Path, apply) -> None:
+        """Call apply with every record in the journal at path."""
+        if not path.exists():
+            return
+        good_size = 0
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    if line.endswith(b"\n"):
+                        botlogger.warning(
+                            f"Skipped an unreadable record in {path}."
+                        )
+                        good_size += len(line)
+                        continue
+                    botlogger.warning(
+                        f"Dropped a torn record at the end of {path}."
+                    )
+                    break
+                good_size += len(line)
+                self.journal_records[path] += 1
+                apply(record)
+        if good_size != path.stat().st_size:
+            with open(path, "r+b") as file:
+                file.truncate(good_size)
+
+    def append(self, path: Path, records: list) -> None:
+        with open(path, "a", encoding="utf-8") as file:
+            file.writelines(
+                json.dumps(record, separators=(",", ":")) + "\n"
+                for record in records
+            )
+            file.flush()
+            os.fsync(file.fileno())
+        self.journal_records[path] += len(records)
+
+    def needs_compaction(self, path: Path, changed: Optional[set]) -> bool:
+        return (
+            changed is None
+            or self.journal_records[path] + len(changed) >= self.compact_every
+        )
+
+    def truncate(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8"):
+            pass
+        self.journal_records[path] = 0
+
+    def load_tickets(self) -> dict:
+        tickets = super().load_tickets()
+
+        def apply(record: dict) -> None:
+            if "put" in record:
+                ticket = record["put"]
+                tickets[str(ticket["channel_id"])] = ticket
+            elif "delete" in record:
+                tickets.pop(str(record["delete"]), None)
+
+        self.replay(self.journal_path, apply)
+        if self.journal_records[self.journal_path]:
+            self.compact(tickets)
+        return tickets
+
+    def needs_all_tickets(self, changed: Optional[set]) -> bool:
+        return self.needs_compaction(self.journal_path, changed)
+
+    def write_tickets(self, tickets: dict, changed: Optional[set] = None) -> None:
+        if self.needs_compaction(self.journal_path, changed):
+            self.compact(tickets)
+            return
+        self.append(
+            self.journal_path,
+            [
+                {"put": tickets[key]} if key in tickets else {"delete": key}
+                for key in changed
+            ],
+        )
+
+    def compact(self, tickets: dict) -> None:
+        """Write a fresh snapshot, then empty the journal it replaces."""
+        super().write_tickets(tickets)
+        self.truncate(self.journal_path)
+
+    def load_blacklist(self) -> set:
+        blacklist = super().load_blacklist()
+
+        def apply(record: dict) -> None:
+            if "put" in record:
+                blacklist.add(int(record["put"]))
+            elif "delete" in record:
+                blacklist.discard(int(record["delete"]))
+
+        self.replay(self.blacklist_journal_path, apply)
+        if self.journal_records[self.blacklist_journal_path]:
+            self.compact_blacklist(blacklist)
+        return blacklist
+
+    def write_blacklist(self, blacklist: set, changed: Optional[set] = None) -> None:
+        if self.needs_compaction(self.blacklist_journal_path, changed):
+            self.compact_blacklist(blacklist)
+            return
+        self.append(
+            self.blacklist_journal_path,
+            [
+                {"put": user_id} if user_id in blacklist else {"delete": user_id}
+                for user_id in changed
+            ],
+        )
+
+    def compact_blacklist(self, blacklist: set) -> None:
+        super().write_blacklist(blacklist)
+        self.truncate(self.blacklist_journal_path)
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Tickets and the blacklist in a WAL mode sqlite database.
+
+    The owner, claimer, status and creation time columns are indexed so
+    per-user and per-status queries don't have to scan every ticket.
+    Keys the bot doesn't know about are kept as JSON in the extra column.
+    Rolling copies made with the sqlite backup API replace the database
+    if it fails its integrity check at startup.
+    """
+
+    name = "sqlite"
+    snapshot_interval = 3600.0
+    schema = """
+        CREATE TABLE IF NOT EXISTS tickets (
+            channel_id INTEGER PRIMARY KEY,
+            owner_id INTEGER NOT NULL,
+            claimer_id INTEGER,
+            message_id INTEGER,
+            selected_purpose TEXT,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS tickets_owner
+            ON tickets (owner_id, status);
+        CREATE INDEX IF NOT EXISTS tickets_claimer
+            ON tickets (claimer_id, status);
+        CREATE INDEX IF NOT EXISTS tickets_status ON tickets (status);
+        CREATE INDEX IF NOT EXISTS tickets_created ON tickets (created_at);
+        CREATE TABLE IF NOT EXISTS blacklist (
+            user_id INTEGER PRIMARY KEY
+        );
+    """
+
+    def __init__(self, directory: Path = data_dir):
+        self.directory = directory
+        self.db_path = directory / "tickets.db"
+        self.snapshots = Snapshots(
+            directory / "snapshots",
+            "tickets",
+            suffix=".db",
+            interval=self.snapshot_interval,
+        )
+        directory.mkdir(parents=True, exist_ok=True)
+        is_new = not self.db_path.exists()
+        self.db = self.connect(self.db_path) if is_new else self.open_checked()
+        self.db.executescript(self.schema)
+        if is_new:
+            self.import_json()
+
+    @staticmethod
+    def connect(path: Path) -> sqlite3.Connection:
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")
+        return db
+
+    @staticmethod
+    def check(path: Path) -> None:
+        db = sqlite3.connect(f"file:{path}?immutable=1", uri=True)
+        try:
+            result = db.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            db.close()
+        if result != "ok":
+            raise sqlite3.DatabaseError(result)
+
+    def open_checked(self) -> sqlite3.Connection:
+        """Open the database, restoring a snapshot if it's corrupted."""
+        db = None
+        try:
+            db = self.connect(self.db_path)
+            result = db.execute("PRAGMA quick_check").fetchone()[0]
+            if result == "ok":
+                return db
+            raise sqlite3.DatabaseError(result)
+        except sqlite3.DatabaseError as e:
+            if db:
+                db.close()
+            botlogger.error(f"{self.db_path} is corrupted.\n{e}")
+
+        started = time.perf_counter()
+        for suffix in ("", "-wal", "-shm"):
+            path = Path(f"{self.db_path}{suffix}")
+            if path.exists():
+                os.replace(path, self.directory / f"corrupted_tickets.db{suffix}")
+        recovered = self.snapshots.recover(self.check)
+        if recovered is None:
+            botlogger.error(f"No valid snapshot of {self.db_path}, starting empty.")
+        else:
+            snapshot = recovered[0]
+            shutil.copyfile(snapshot, self.db_path)
+            botlogger.warning(
+                f"Recovered {self.db_path} from {snapshot.name} in "
+                f"{time.perf_counter() - started:.2f}s."
+            )
+        return self.connect(self.db_path)
+
+    def backup(self, path: Path) -> None:
+        temp_path = path.with_name(path.name + ".tmp")
+        target = sqlite3.connect(temp_path)
+        try:
+            self.db.backup(target)
+        finally:
+            target.close()
+        with open(temp_path, "rb+") as file:
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+        sync_directory(path.parent)
+
+    def import_json(self) -> None:
+        """Seed a new database from the json files if there are any."""
+        json_backend = JsonBackend(self.directory)
+        if json_backend.tickets_path.exists():
+            tickets = json_backend.load_tickets()
+            self.write_tickets(tickets)
+            botlogger.info(
+                f"Imported {len(tickets)} tickets from {json_backend.tickets_path}."
+            )
+        if json_backend.blacklist_path.exists():
+            self.write_blacklist(json_backend.load_blacklist())
+
+    @staticmethod
+    def to_row(ticket: dict) -> tuple:
+        extra = {k: v for k, v in ticket.items() if k not in ticket_columns}
+        return (
+            int(ticket["channel_id"]),
+            ticket["owner_id"],
+            ticket.get("claimer_id"),
+            ticket.get("message_id"),
+            ticket.get("selected_purpose"),
+            ticket["status"],
+            ticket["created_at"],
+            json.dumps(extra) if extra else None,
+        )
+
+    @staticmethod
+    def from_row(row: tuple) -> dict:
+        ticket = dict(zip(ticket_columns, row[:-1]))
+        if row[-1]:
+            ticket.update(json.loads(row[-1]))
+        return ticket
+
+    def load_tickets(self) -> dict:
+        rows = self.db.execute(
+            f"SELECT {', '.join(ticket_columns)}, extra FROM tickets"
+        )
+        return {str(row[0]): self.from_row(row) for row in rows}
+
+    def write_tickets(self, tickets: dict, changed: Optional[set] = None) -> None:
+        if changed is None:
+            changed = set(tickets)
+            stored = {
+                str(row[0])
+                for row in self.db.execute("SELECT channel_id FROM tickets")
+            }
+            removed = stored - changed
+        else:
+            removed = {key for key in changed if key not in tickets}
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.to_row(tickets[key]) for key in changed if key in tickets),
+            )
+            self.db.executemany(
+                "DELETE FROM tickets WHERE channel_id = ?",
+                ((int(key),) for key in removed),
+            )
+        if self.snapshots.due():
+            self.snapshots.take(self.backup)
+
+    def load_blacklist(self) -> set:
+        return {
+            row[0] for row in self.db.execute("SELECT user_id FROM blacklist")
+        }
+
+    def write_blacklist(self, blacklist: set, changed: Optional[set] = None) -> None:
+        with self.db:
+            if changed is None:
+                self.db.execute("DELETE FROM blacklist")
+                changed = blacklist
+            self.db.executemany(
+                "INSERT OR IGNORE INTO blacklist VALUES (?)",
+                ((user_id,) for user_id in changed if user_id in blacklist),
+            )
+            self.db.executemany(
+                "DELETE FROM blacklist WHERE user_id = ?",
+                ((user_id,) for user_id in changed if user_id not in blacklist),
+            )
+
+    def close(self) -> None:
+        self.snapshots.take(self.backup)
+        self.db.close()
+
+
+backends = {
+    JsonBackend.name: JsonBackend,
+    JournalBackend.name: JournalBackend,
+    SqliteBackend.name: SqliteBackend,
+}
+
+
+def create_backend(name: str, directory: Path = data_dir) -> StorageBackend:
+    if name not in backends:
+        raise ValueError(f"Unknown storage backend : {name}")
+    return backends[name](directory)
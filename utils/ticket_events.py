@@ -0,0 +1,118 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+from collections import defaultdict
+from typing import Awaitable, Callable, Optional
+from utils.ticket_record import Ticket, TicketStatus
+import asyncio
+import logging
+
+botlogger = logging.getLogger("bot")
+
+
+class TicketEvent:
+    """
+    Published by utils.tickets once a change is saved. ticket is the
+    record as it was committed, subscribers must not modify it.
+    """
+
+    __slots__ = ("ticket",)
+
+    def __init__(self, ticket: Ticket):
+        self.ticket = ticket
+
+    @property
+    def channel_id(self) -> int:
+        return self.ticket.channel_id
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.ticket!r})"
+
+
+class TicketCreated(TicketEvent):
+    __slots__ = ()
+
+
+class TicketClaimed(TicketEvent):
+    __slots__ = ()
+
+
+class TicketTransferred(TicketEvent):
+    __slots__ = ("previous_claimer_id",)
+
+    def __init__(self, ticket: Ticket, previous_claimer_id: int):
+        super().__init__(ticket)
+        self.previous_claimer_id = previous_claimer_id
+
+
+class TicketStatusChanged(TicketEvent):
+    __slots__ = ("previous_status",)
+
+    def __init__(self, ticket: Ticket, previous_status: TicketStatus):
+        super().__init__(ticket)
+        self.previous_status = previous_status
+
+
+class TicketClosed(TicketStatusChanged):
+    __slots__ = ()
+
+
+Subscriber = Callable[[TicketEvent], Awaitable[None]]
+
+# Subscribers get the events of their type and its subclasses, so
+# TicketStatusChanged also receives TicketClosed and TicketEvent gets all.
+_subscribers: dict[type, list] = defaultdict(list)
+_deliveries: set = set()
+
+
+def subscribe(event_type: type, callback: Subscriber) -> None:
+    _subscribers[event_type].append(callback)
+
+
+def unsubscribe(event_type: type, callback: Subscriber) -> None:
+    if callback in _subscribers[event_type]:
+        _subscribers[event_type].remove(callback)
+
+
+def diff(before: Optional[Ticket], after: Ticket) -> list:
+    """The events describing how a ticket changed, before None means created."""
+    if before is None:
+        return [TicketCreated(after)]
+    events = []
+    if before.claimer_id != after.claimer_id and after.claimer_id is not None:
+        if before.claimer_id is None:
+            events.append(TicketClaimed(after))
+        else:
+            events.append(TicketTransferred(after, before.claimer_id))
+    if before.status != after.status:
+        if after.status == TicketStatus.CLOSED:
+            events.append(TicketClosed(after, before.status))
+        else:
+            events.append(TicketStatusChanged(after, before.status))
+    return events
+
+
+def publish(*events: TicketEvent) -> None:
+    """
+    Hand events to their subscribers, each call runs in its own task so
+    a slow or failing subscriber never holds up the publisher.
+    """
+    for event in events:
+        for event_type in type(event).__mro__:
+            for callback in _subscribers.get(event_type, ()):
+                task = asyncio.create_task(_deliver(callback, event))
+                _deliveries.add(task)
+                task.add_done_callback(_deliveries.discard)
+
+
+async def _deliver(callback: Subscriber, event: TicketEvent) -> None:
+    try:
+        await callback(event)
+    except Exception:
+        botlogger.exception(f"Ticket event subscriber failed on {event!r}.")
@@ -0,0 +1,119 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+import asyncio
+import discord
+import logging
+from typing import Optional
+
+botlogger = logging.getLogger("bot")
+
+# Changes made within this many seconds of each other go out as one edit.
+debounce = 2.0
+
+
+class TicketHeader:
+    """
+    The embed of a ticket's first message as the bot last rendered it.
+
+    Fields are changed on the model and the message is edited through a
+    PartialMessage, so an update never fetches the message. sent is the
+    payload Discord currently has, an edit that wouldn't change it is
+    skipped.
+    """
+
+    __slots__ = ("channel_id", "message_id", "embed", "sent", "pending")
+
+    def __init__(self, channel_id: int, message_id: int, embed: discord.Embed):
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.embed = embed
+        self.sent = embed.to_dict()
+        self.pending: Optional[asyncio.Task] = None
+
+    def set_field(self, name: str, value: str, inline: bool = True) -> None:
+        for index, field in enumerate(self.embed.fields):
+            if field.name == name:
+                self.embed.set_field_at(
+                    index, name=name, value=value, inline=field.inline
+                )
+                return
+        self.embed.add_field(name=name, value=value, inline=inline)
+
+
+_headers: dict[int, TicketHeader] = {}
+
+
+def register(message: discord.Message) -> Optional[TicketHeader]:
+    """Model the header from the message the bot just sent."""
+    if not message.embeds:
+        return None
+    header = TicketHeader(message.channel.id, message.id, message.embeds[0])
+    _headers[header.channel_id] = header
+    return header
+
+
+def forget(channel_id: int) -> None:
+    header = _headers.pop(channel_id, None)
+    if header and header.pending:
+        header.pending.cancel()
+
+
+async def _load(
+    channel: discord.TextChannel, message_id: int
+) -> Optional[TicketHeader]:
+    # Only needed for tickets created before the bot last started.
+    header = _headers.get(channel.id)
+    if header and header.message_id == message_id:
+        return header
+    try:
+        message = await channel.fetch_message(message_id)
+    except discord.HTTPException as e:
+        botlogger.warning(f"Failed to load ticket header {message_id}: {e}")
+        return None
+    return register(message)
+
+
+async def set_field(
+    channel: discord.TextChannel,
+    message_id: int,
+    field_name: str,
+    new_value: str,
+) -> None:
+    """Change one field of a ticket header, the edit is sent debounced."""
+    header = await _load(channel, message_id)
+    if not header:
+        return
+    header.set_field(field_name, new_value)
+    if header.pending is None or header.pending.done():
+        header.pending = asyncio.create_task(_flush_later(channel, header))
+
+
+async def _flush_later(channel: discord.TextChannel, header: TicketHeader):
+    await asyncio.sleep(debounce)
+    header.pending = None
+    await flush(channel, header)
+
+
+async def flush(channel: discord.TextChannel, header: TicketHeader) -> bool:
+    """Send the model if it differs from what Discord has, True if edited."""
+    payload = header.embed.to_dict()
+    if payload == header.sent:
+        return False
+    message = channel.get_partial_message(header.message_id)
+    try:
+        await message.edit(embed=discord.Embed.from_dict(payload))
+    except discord.NotFound:
+        forget(header.channel_id)
+        return False
+    except discord.HTTPException as e:
+        botlogger.warning(f"Failed to update embed field: {e}")
+        return False
+    header.sent = payload
+    return True
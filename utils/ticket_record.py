@@ -0,0 +1,162 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+import sys
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Optional
+
+
+class TicketStatus(str, Enum):
+    OPEN = "open"
+    INACTIVE = "inactive"
+    CLOSED = "closed"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+def to_epoch(value) -> Optional[float]:
+    """
+    Epoch seconds from a stored timestamp, str(datetime), a datetime or a
+    number. Naive times are taken as UTC.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def from_epoch(value: Optional[float]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+class Ticket:
+    """
+    One ticket held by the store.
+
+    Ids are ints, the status is a TicketStatus and times are epoch
+    seconds, so comparisons and age checks never parse strings.
+    from_dict and to_dict convert from and to the dicts written to disk,
+    unknown keys are kept in extra and written back unchanged.
+    """
+
+    __slots__ = (
+        "channel_id",
+        "owner_id",
+        "claimer_id",
+        "message_id",
+        "selected_purpose",
+        "status",
+        "created_at",
+        "closed_at",
+        "last_activity",
+        "extra",
+    )
+
+    def __init__(
+        self,
+        channel_id: int,
+        owner_id: int,
+        selected_purpose: str,
+        status: TicketStatus = TicketStatus.OPEN,
+        claimer_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+        created_at: float = 0.0,
+        closed_at: Optional[float] = None,
+        last_activity: Optional[float] = None,
+        extra: Optional[dict] = None,
+    ):
+        self.channel_id = channel_id
+        self.owner_id = owner_id
+        self.claimer_id = claimer_id
+        self.message_id = message_id
+        self.selected_purpose = selected_purpose
+        self.status = status
+        self.created_at = created_at
+        self.closed_at = closed_at
+        self.last_activity = last_activity
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Ticket":
+        data = dict(data)
+        claimer_id = data.pop("claimer_id", None)
+        message_id = data.pop("message_id", None)
+        purpose = data.pop("selected_purpose", None)
+        return cls(
+            channel_id=int(data.pop("channel_id")),
+            owner_id=int(data.pop("owner_id")),
+            # Purposes repeat across tickets, share one string per purpose.
+            selected_purpose=sys.intern(purpose) if purpose else purpose,
+            status=TicketStatus(data.pop("status", "open")),
+            claimer_id=int(claimer_id) if claimer_id is not None else None,
+            message_id=int(message_id) if message_id is not None else None,
+            created_at=to_epoch(data.pop("created_at")),
+            closed_at=to_epoch(data.pop("closed_at", None)),
+            last_activity=to_epoch(data.pop("last_activity", None)),
+            extra=data or None,
+        )
+
+    def to_dict(self) -> dict:
+        data = {
+            "channel_id": self.channel_id,
+            "owner_id": self.owner_id,
+            "claimer_id": self.claimer_id,
+            "message_id": self.message_id,
+            "selected_purpose": self.selected_purpose,
+            "status": self.status.value,
+            "created_at": str(from_epoch(self.created_at)),
+        }
+        if self.closed_at is not None:
+            data["closed_at"] = str(from_epoch(self.closed_at))
+        if self.last_activity is not None:
+            data["last_activity"] = str(from_epoch(self.last_activity))
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @property
+    def created(self) -> datetime:
+        return from_epoch(self.created_at)
+
+    @property
+    def closed(self) -> Optional[datetime]:
+        return from_epoch(self.closed_at)
+
+    @property
+    def active_at(self) -> float:
+        """When the last message was seen, creation if none was."""
+        return self.last_activity or self.created_at
+
+    def copy(self) -> "Ticket":
+        ticket = Ticket.__new__(Ticket)
+        for name in self.__slots__:
+            setattr(ticket, name, getattr(self, name))
+        if self.extra:
+            ticket.extra = dict(self.extra)
+        return ticket
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Ticket):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name)
+            for name in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Ticket(channel_id={self.channel_id}, owner_id={self.owner_id}, "
+            f"status={self.status.value}, claimer_id={self.claimer_id})"
+        )
@@ -7,286 +7,659 @@
 # If not, see https://www.gnu.org/licenses/gpl-3.0.txt
 
 
-import json
-from pathlib import Path
 from typing import Optional
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import datetime
 from utils.timestmp import utcnow
+from utils.config import load_config
+from utils.archive import TicketArchive
+from utils.ticket_record import Ticket, TicketStatus
+from utils import storage, ticket_events
 import asyncio
-import os
+import json
+import logging
+import time
+
+botlogger = logging.getLogger("bot")
+botconfig = load_config()
+
+# Opened by load_tickets(), importing this module never touches the disk.
+backend: Optional[storage.StorageBackend] = None
+
+# Tickets are loaded once and kept in memory. Writes are group committed,
+# every change made within commit_window seconds goes to disk in one
+# durable write and each caller awaits a future resolved once it's saved.
+# Callers wait at most commit_timeout seconds for it, so a slow disk can't
+# eat the 3 second interaction deadline, the write still finishes later.
+commit_window = 0.05
+commit_timeout = 1.0
+retry_delay = 5.0
+# Activity is kept in memory as messages come in and written at most once
+# per ticket every activity_save_interval seconds, plus on close().
+activity_save_interval = 60.0
+_tickets: Optional[dict] = None
+_load_lock = asyncio.Lock()
+_commit_lock = asyncio.Lock()
+_dirty: Optional[set] = set()  # Changed channel ids, None means everything
+_waiters: list = []
+_writer_task: Optional[asyncio.Task] = None
+_unsaved_activity: dict = {}  # Channel id to the activity last written
+_closed = False  # Set by close(), later changes stay in memory only
+open_statuses = (TicketStatus.OPEN, TicketStatus.INACTIVE)
+
+# All disk I/O and (de)serialization runs on this thread, never on the
+# event loop. A single worker also keeps the writes in submission order.
+_io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tickets-io")
+
+
+async def _run_io(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, partial(func, *args))
+
+
+class TicketIndex:
+    """
+    Owner counts, status sets and claimer sets kept in step with the
+    store, so count and lookup helpers don't scan every ticket ever made.
+    """
+
+    def __init__(self):
+        self.entries: dict[int, tuple] = {}
+        self.owners: dict[int, Counter] = defaultdict(Counter)
+        self.statuses: dict[TicketStatus, set] = defaultdict(set)
+        self.claimers: dict[int, set] = defaultdict(set)
+
+    def rebuild(self, tickets: dict) -> None:
+        self.__init__()
+        for key, ticket in tickets.items():
+            self.update(key, ticket)
+
+    def update(self, key: int, ticket: Optional[Ticket]) -> None:
+        """Re-index one ticket after it changed, None drops it."""
+        entry = self.entries.pop(key, None)
+        if entry:
+            owner_id, status, claimer_id = entry
+            self.owners[owner_id][status] -= 1
+            self.statuses[status].discard(key)
+            if claimer_id is not None:
+                self.claimers[claimer_id].discard(key)
+        if not ticket:
+            return
+        owner_id = ticket.owner_id
+        status = ticket.status
+        claimer_id = ticket.claimer_id if status in open_statuses else None
+        self.entries[key] = (owner_id, status, claimer_id)
+        self.owners[owner_id][status] += 1
+        self.statuses[status].add(key)
+        if claimer_id is not None:
+            self.claimers[claimer_id].add(key)
+
+    def count_for_owner(self, owner_id: int, statuses=None) -> int:
+        counts = self.owners.get(owner_id)
+        if not counts:
+            return 0
+        if statuses is None:
+            return sum(counts.values())
+        return sum(counts[status] for status in statuses)
+
+
+class StoreLock:
+    """
+    Striped per-channel locks plus a store-wide exclusive mode.
+
+    Single ticket operations only serialize with operations on tickets
+    that share their stripe, so unrelated tickets are handled
+    concurrently. Whole-store operations wait for the running ticket
+    operations to finish and hold new ones back until they are done.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self.stripes = [asyncio.Lock() for _ in range(stripes)]
+        self.condition = asyncio.Condition()
+        self.running = 0
+        self.exclusive = False
+        self.exclusive_waiting = 0
+
+    def stripe(self, channel_id: int | str) -> asyncio.Lock:
+        # The low bits of a snowflake are a per-process counter that is
+        # nearly always small, the timestamp bits spread ids evenly.
+        return self.stripes[(int(channel_id) >> 22) % len(self.stripes)]
+
+    @asynccontextmanager
+    async def ticket(self, channel_id: int | str):
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: not self.exclusive and not self.exclusive_waiting
+            )
+            self.running += 1
+        try:
+            async with self.stripe(channel_id):
+                yield
+        finally:
+            async with self.condition:
+                self.running -= 1
+                self.condition.notify_all()
+
+    @asynccontextmanager
+    async def store(self):
+        async with self.condition:
+            self.exclusive_waiting += 1
+            try:
+                await self.condition.wait_for(
+                    lambda: not self.exclusive and not self.running
+                )
+            finally:
+                self.exclusive_waiting -= 1
+            self.exclusive = True
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.exclusive = False
+                self.condition.notify_all()
+
+
+_index = TicketIndex()
+locks = StoreLock()
+archive = TicketArchive()
 
 
-data_dir = Path("data")
-tickets_path = Path("data/tickets.json")
-blacklist_path = Path("data/blacklist.json")
-default_data = {}
-default_blacklist_data = {"blacklisted" : []}
-lock = asyncio.Lock()
+# Black list functionality
+# The blacklist lives in memory as a set of ints with its own lock, checks
+# never wait on a ticket save and only the changed id is persisted.
+blacklist_lock = asyncio.Lock()
+_blacklist: Optional[set] = None
 
 
-async def ensure(path=tickets_path, default=default_data) -> None:
-    data_dir.mkdir(exist_ok=True)
-    if not path.exists():
-        with open(path, "w", encoding="utf-8") as file:
-            json.dump(default, file, indent=4)
-    elif os.path.getsize(path) == 0:
-        with open(path, "w", encoding="utf-8") as file:
-            json.dump(default, file, indent=4)
+async def _get_blacklist() -> set:
+    # Loaded together with the tickets.
+    await load_tickets()
+    return _blacklist
 
 
-async def ensure_blacklist(path=blacklist_path, default=default_blacklist_data) -> None:
-    data_dir.mkdir(exist_ok=True)
-    if not path.exists():
-        with open(path, "w", encoding="utf-8") as file:
-            json.dump(default, file, indent=4)
-            return
-    elif os.path.getsize(path) == 0:
-        with open(path, "w", encoding="utf-8") as file:
-            json.dump(default, file, indent=4)
-            return
-
-
-# Black list functionality
 async def load_blacklist() -> dict:
-    await ensure_blacklist()
-    try:
-        with open(blacklist_path, "r", encoding="utf-8") as file:
-            data: dict = json.load(file)
-            black_list = data.get("blacklisted")
-            if not black_list or not isinstance(black_list, list):
-                with open(blacklist_path, "w", encoding="utf-8") as file:
-                    json.dump(default_blacklist_data, file, indent=4)
-                    return default_blacklist_data
-            if isinstance(data, dict):
-                return data
-            return {}
-    except json.JSONDecodeError:
-        with open(blacklist_path, "r", encoding="utf-8") as file:
-            data = file.read()
-            with open(
-                Path("data/corrupted_blacklist.txt"), "a", encoding="utf-8"
-            ) as corrupted_file:
-                corrupted_file.write(data)
-            with open(blacklist_path, "w", encoding="utf-8") as file:
-                json.dump({}, file, indent=4)
-            return {}
+    return {"blacklisted": [str(user_id) for user_id in await _get_blacklist()]}
 
 
 async def add_blacklist(user_id: int | str):
-        async with lock:
-            blacklisted: dict = await load_blacklist()
-            black_list: list = blacklisted.get("blacklisted", [])
-            if str(user_id) in black_list or not user_id:
-                return False
-            black_list.append(str(user_id))
-            with open(blacklist_path, "w", encoding="utf-8") as file:
-                json.dump(blacklisted, file, indent=4)
-            return True
+    if not user_id:
+        return False
+    user_id = int(user_id)
+    async with blacklist_lock:
+        black_list = await _get_blacklist()
+        if user_id in black_list:
+            return False
+        black_list.add(user_id)
+        try:
+            await _run_io(backend.write_blacklist, set(black_list), {user_id})
+        except storage.storage_errors:
+            black_list.discard(user_id)
+            raise
+        return True
+
 
 async def remove_blacklist(user_id: int | str):
-    async with lock:
-        blacklisted: dict = await load_blacklist()
-        black_list: list = blacklisted.get("blacklisted", [])
-        if str(user_id) not in black_list or not user_id:
+    if not user_id:
+        return False
+    user_id = int(user_id)
+    async with blacklist_lock:
+        black_list = await _get_blacklist()
+        if user_id not in black_list:
             return False
-        black_list.remove(str(user_id))
-        with open(blacklist_path, "w", encoding="utf-8") as file:
-            json.dump(blacklisted, file, indent=4)
+        black_list.discard(user_id)
+        try:
+            await _run_io(backend.write_blacklist, set(black_list), {user_id})
+        except storage.storage_errors:
+            black_list.add(user_id)
+            raise
         return True
 
+
 async def is_blacklisted(user_id: int | str):
-    async with lock:
-        blacklisted = await load_blacklist()
-        black_list = blacklisted.get('blacklisted', [])
-        if str(user_id) in black_list:
-            return True
-        return False
+    return int(user_id) in await _get_blacklist()
+
+
+def _load_records() -> dict:
+    # A malformed record, such as one broken by a hand edit, is set aside
+    # in corrupted_tickets.txt instead of keeping the bot from starting.
+    tickets = {}
+    corrupted = []
+    for key, data in backend.load_tickets().items():
+        try:
+            tickets[int(key)] = Ticket.from_dict(data)
+        except (KeyError, TypeError, ValueError) as e:
+            botlogger.error(f"Skipped the malformed ticket {key!r}: {e!r}")
+            corrupted.append(json.dumps({key: data}, default=str) + "\n")
+    if corrupted:
+        with open(
+            backend.directory / "corrupted_tickets.txt", "a", encoding="utf-8"
+        ) as corrupted_file:
+            corrupted_file.writelines(corrupted)
+    return tickets
 
 
 async def load_tickets() -> dict:
-    await ensure()
+    """The resident store, Ticket records keyed by int channel id."""
+    global _tickets, _blacklist, backend
+    if _tickets is not None:
+        return _tickets
+    async with _load_lock:
+        if _tickets is None:
+            started = time.perf_counter()
+            if backend is None:
+                backend = await _run_io(
+                    storage.create_backend, botconfig.storage_backend
+                )
+            tickets = await _run_io(_load_records)
+            _blacklist = await _run_io(backend.load_blacklist)
+            await _run_io(archive.load)
+            _index.rebuild(tickets)
+            _tickets = tickets
+            botlogger.info(
+                f"Loaded {len(tickets)} tickets from the {backend.name} "
+                f"storage in {time.perf_counter() - started:.2f}s."
+            )
+    return _tickets
+
+
+def _mark_dirty(channel_id: Optional[int | str] = None) -> asyncio.Future:
+    global _dirty, _writer_task
+    loop = asyncio.get_running_loop()
+    if _closed:
+        botlogger.warning(
+            f"Ticket {channel_id} changed after the store was closed, "
+            "the change is not saved."
+        )
+        committed = loop.create_future()
+        committed.set_result(None)
+        return committed
+    if channel_id is None:
+        _dirty = None
+    elif _dirty is not None:
+        _dirty.add(int(channel_id))
+    committed = loop.create_future()
+    _waiters.append(committed)
+    if _writer_task is None or _writer_task.done():
+        _writer_task = loop.create_task(_writer())
+    return committed
+
+
+async def _wait_committed(committed: asyncio.Future) -> None:
     try:
-        with open(tickets_path, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            if isinstance(data, dict):
-                return data
-            return {}
-    except json.JSONDecodeError:
-        with open(tickets_path, "r", encoding="utf-8") as file:
-            data = file.read()
-            with open(
-                Path("data/corrupted_tickets.txt"), "a", encoding="utf-8"
-            ) as corrupted_file:
-                corrupted_file.write(data)
-
-        with open(tickets_path, "w", encoding="utf-8") as file:
-            json.dump({}, file, indent=4)
-        return {}
-
-
-async def save_tickets(data: dict):
-        await ensure()
-        with open(tickets_path, "w", encoding="utf-8") as file:
-            json.dump(data, file, indent=4)
-
-
-async def get_ticket(channel_id: int) -> Optional[dict]:
-    async with lock:
-        tickets = await load_tickets()
-        return tickets.get(str(channel_id))
+        await asyncio.wait_for(asyncio.shield(committed), commit_timeout)
+    except asyncio.TimeoutError:
+        botlogger.warning(
+            f"Ticket write took longer than {commit_timeout}s, "
+            "continuing without waiting for it."
+        )
 
 
-async def get_tickets_and_ticket(channel_id: int):
-    async with lock:
-        tickets = await load_tickets()
-        return tickets, tickets.get(str(channel_id))
+async def _writer() -> None:
+    while _waiters:
+        await asyncio.sleep(commit_window)
+        if not await _commit():
+            await asyncio.sleep(retry_delay)
+
+
+def _records(changed: Optional[set]) -> dict:
+    # A shallow copy of what the backend needs, taken on the event loop.
+    # Commits replace records rather than change them and touch_ticket
+    # only assigns last_activity, so the I/O thread can serialize them.
+    if backend.needs_all_tickets(changed):
+        return dict(_tickets)
+    return {
+        int(key): _tickets[int(key)] for key in changed if int(key) in _tickets
+    }
+
+
+def _write_records(records: dict, changed: Optional[set]) -> None:
+    # Runs on the I/O thread, a full store takes too long to convert on
+    # the event loop.
+    backend.write_tickets(
+        {str(key): ticket.to_dict() for key, ticket in records.items()},
+        changed,
+    )
+
+
+async def _commit() -> bool:
+    global _dirty, _waiters
+    async with _commit_lock:
+        changed, _dirty = _dirty, set()
+        waiters, _waiters = _waiters, []
+        try:
+            if _tickets is not None and changed != set():
+                keys = None if changed is None else {str(key) for key in changed}
+                await _run_io(_write_records, _records(keys), keys)
+        except storage.storage_errors as e:
+            botlogger.error(f"Couldn't write the tickets, will retry.\n{e}")
+            if changed is None or _dirty is None:
+                _dirty = None
+            else:
+                _dirty |= changed
+            _waiters = waiters + _waiters
+            return False
+        for committed in waiters:
+            if not committed.done():
+                committed.set_result(None)
+        return True
 
 
-async def create_ticket(channel_id: int, owner_id: int, purpose: str) -> dict:
-    async with lock:
+async def flush() -> None:
+    """Write pending ticket changes to disk right away."""
+    if _dirty != set() or _waiters:
+        await _commit()
+
+
+async def close() -> None:
+    """Flush pending changes and release the storage backend."""
+    global _closed
+    if _closed:
+        return
+    if _tickets is not None:
+        for key in _unsaved_activity:
+            _mark_dirty(key)
+        _unsaved_activity.clear()
+    await flush()
+    _closed = True
+    if backend is not None:
+        await _run_io(backend.close)
+    _io_executor.shutdown(wait=True)
+
+
+# Records are replaced rather than changed when a transaction commits, so
+# single ticket reads see a consistent record without taking a lock.
+async def get_ticket(channel_id: int) -> Optional[Ticket]:
+    tickets = await load_tickets()
+    return tickets.get(int(channel_id))
+
+
+@asynccontextmanager
+async def transaction(channel_id: int | str):
+    """
+    Atomic read-modify-write of one ticket.
+
+        async with tickets.transaction(channel_id) as ticket:
+            if ticket and ticket.claimer_id is None:
+                ticket.claimer_id = staff_id
+
+    Yields a copy of the ticket, or None if there is no such ticket, while
+    holding that ticket's lock. Changes are committed in one write when
+    the block exits normally and dropped if it raises, the matching
+    ticket_events are published after the commit. Don't call other
+    utils.tickets functions inside the block, they would wait on it.
+    """
+    key = int(channel_id)
+    committed = None
+    events = []
+    async with locks.ticket(key):
+        tickets = await load_tickets()
+        ticket = tickets.get(key)
+        working = ticket.copy() if ticket else None
+        seen_activity = ticket.last_activity if ticket else None
+        yield working
+        if ticket and working.last_activity == seen_activity:
+            # Keep activity recorded by touch_ticket while the block ran.
+            working.last_activity = ticket.last_activity
+        if ticket and working != ticket:
+            committed = _replace(tickets, ticket, working)
+            events = ticket_events.diff(ticket, working)
+    if committed:
+        await _wait_committed(committed)
+        ticket_events.publish(*events)
+
+
+def _replace(tickets: dict, ticket: Ticket, working: Ticket) -> asyncio.Future:
+    # Swaps a changed copy in for the stored record, the caller holds its lock.
+    closing = working.status == TicketStatus.CLOSED
+    if closing and ticket.status != TicketStatus.CLOSED:
+        working.closed_at = utcnow().timestamp()
+    tickets[working.channel_id] = working
+    _index.update(working.channel_id, working)
+    return _mark_dirty(working.channel_id)
+
+
+async def set_ticket_statuses(statuses: dict) -> list:
+    """
+    Set the status of many tickets at once, {channel_id: status}, saved
+    in a single write. Returns the tickets that actually changed.
+    """
+    changed = []
+    events = []
+    committed = None
+    async with locks.store():
         tickets = await load_tickets()
-        if str(channel_id) in tickets:
+        for channel_id, status in statuses.items():
+            ticket = tickets.get(int(channel_id))
+            status = TicketStatus(status)
+            if not ticket or ticket.status == status:
+                continue
+            working = ticket.copy()
+            working.status = status
+            committed = _replace(tickets, ticket, working)
+            events.extend(ticket_events.diff(ticket, working))
+            changed.append(working)
+    if committed:
+        await _wait_committed(committed)
+        ticket_events.publish(*events)
+    return changed
+
+
+async def create_ticket(channel_id: int, owner_id: int, purpose: str) -> Ticket:
+    async with locks.ticket(channel_id):
+        tickets = await load_tickets()
+        if channel_id in tickets:
             raise ValueError("Ticket already exists for this channel")
-        ticket = {
-            "channel_id": channel_id,
-            "owner_id": owner_id,
-            "claimer_id": None,
-            "message_id": None,
-            "selected_purpose": purpose,
-            "status": "open",
-            "created_at": str(utcnow()),
-        }
-        tickets[str(channel_id)] = ticket
-        await save_tickets(tickets)
-        return ticket
+        now = utcnow().timestamp()
+        ticket = Ticket(
+            channel_id=channel_id,
+            owner_id=owner_id,
+            selected_purpose=purpose,
+            created_at=now,
+            last_activity=now,
+        )
+        tickets[channel_id] = ticket
+        _index.update(channel_id, ticket)
+        committed = _mark_dirty(channel_id)
+    await _wait_committed(committed)
+    ticket_events.publish(ticket_events.TicketCreated(ticket))
+    return ticket
 
 
 async def claim_ticket(channel_id: int, staff_id: int) -> bool:
-    async with lock:
-        tickets = await load_tickets()
-        ticket = tickets.get(str(channel_id))
-
+    async with transaction(channel_id) as ticket:
         if not ticket:
             return False
 
-        if ticket["claimer_id"] is not None:
+        if ticket.claimer_id is not None:
             return False
 
-        ticket["claimer_id"] = staff_id
-        await save_tickets(tickets)
-        return True
+        ticket.claimer_id = staff_id
+    return True
 
 
 async def transfer_ticket(
     channel_id: int, staff_id: int, new_staff_id: int
 ) -> bool:
-    async with lock:
-        tickets = await load_tickets()
-        ticket = tickets.get(str(channel_id))
-
+    async with transaction(channel_id) as ticket:
         if not ticket:
             return False
-        if ticket["claimer_id"] != staff_id:
+        if ticket.claimer_id != staff_id:
             return False
-        ticket["claimer_id"] = new_staff_id
-        await save_tickets(tickets)
-        return True
+        ticket.claimer_id = new_staff_id
+    return True
 
 
 async def close_ticket(channel_id: int, staff_id: int) -> bool:
-    async with lock:
-        tickets = await load_tickets()
-        ticket = tickets.get(str(channel_id))
+    async with transaction(channel_id) as ticket:
         if not ticket:
             return False
-        if ticket["claimer_id"] != staff_id:
+        if ticket.claimer_id != staff_id:
+            return False
+        ticket.status = TicketStatus.CLOSED
+    return True
+
+
+async def set_ticket_status(channel_id: int, status: str) -> bool:
+    status = TicketStatus(status)
+    async with transaction(channel_id) as ticket:
+        if not ticket or ticket.status == status:
+            return False
+        ticket.status = status
+    return True
+
+
+async def set_ticket_message(channel_id: int, message_id: int) -> bool:
+    async with transaction(channel_id) as ticket:
+        if not ticket:
             return False
-        ticket["status"] = "closed"
-        await save_tickets(tickets)
+        ticket.message_id = message_id
+    return True
+
+
+async def touch_ticket(channel_id: int, when: Optional[float] = None) -> bool:
+    """
+    Record activity in an open or inactive ticket, when is epoch seconds
+    and defaults to now. It's cheap enough to call on every message, the
+    record is updated in place without taking the ticket lock.
+    """
+    tickets = await load_tickets()
+    key = int(channel_id)
+    ticket = tickets.get(key)
+    if not ticket or ticket.status not in open_statuses:
+        return False
+    when = when or utcnow().timestamp()
+    if ticket.last_activity and when <= ticket.last_activity:
         return True
+    saved = _unsaved_activity.setdefault(key, ticket.active_at)
+    ticket.last_activity = when
+    if when - saved >= activity_save_interval:
+        del _unsaved_activity[key]
+        _mark_dirty(key)
+    return True
 
 
 async def is_ticket(channel_id: int) -> bool:
-    async with lock:
-        tickets = await load_tickets()
-        return str(channel_id) in tickets
+    tickets = await load_tickets()
+    return int(channel_id) in tickets
 
 
 async def get_ticket_owner(channel_id: int) -> Optional[int]:
     ticket = await get_ticket(channel_id)
     if not ticket:
         return None
-    return ticket["owner_id"]
+    return ticket.owner_id
 
 
 async def get_ticket_claimer(channel_id: int) -> Optional[int]:
     ticket = await get_ticket(channel_id)
     if not ticket:
         return None
-    return ticket["claimer_id"]
+    return ticket.claimer_id
 
 
 async def is_ticket_claimed(channel_id: int) -> bool:
     ticket = await get_ticket(channel_id)
-    return bool(ticket and ticket["claimer_id"] is not None)
+    return bool(ticket and ticket.claimer_id is not None)
 
 
 async def is_ticket_open(channel_id: int) -> bool:
     ticket = await get_ticket(channel_id)
-    return bool(ticket and ticket["status"] == "open")
+    return bool(ticket and ticket.status == TicketStatus.OPEN)
 
 
-async def get_ticket_status(channel_id: int) -> Optional[str]:
+async def get_ticket_status(channel_id: int) -> Optional[TicketStatus]:
     ticket = await get_ticket(channel_id)
     if not ticket:
         return None
-    return ticket["status"]
+    return ticket.status
 
 
 async def get_ticket_purpose(channel_id: int) -> Optional[str]:
     ticket = await get_ticket(channel_id)
     if not ticket:
         return None
-    return ticket["selected_purpose"]
+    return ticket.selected_purpose
 
 
-async def get_ticket_time(channel_id: int) -> Optional[str]:
+async def get_ticket_time(channel_id: int) -> Optional[datetime]:
     ticket = await get_ticket(channel_id)
     if not ticket:
         return None
-    return ticket["created_at"]
-
-
-async def get_all_tickets():
-    async with lock:
-        tckts = await load_tickets()
-        return tckts.copy()
+    return ticket.created
 
 
+# Counts read the indexes, which only change between awaits, so they are
+# consistent without taking any lock and never queue behind a ticket.
 async def get_tickets_count():
-    async with lock:
-        return len(await load_tickets())
+    return len(await load_tickets())
 
 
 async def get_tickets_count_for_user(user_id: int):
-    async with lock:
-        tickets = await load_tickets()
-        owner_to_check = user_id
-        open_count = sum(
-            1
-            for ticket in tickets.values()
-            if ticket["owner_id"] == owner_to_check
-            and ticket["status"] in ["open", "inactive"]
-        )
-        return open_count
+    await load_tickets()
+    return _index.count_for_owner(user_id, open_statuses)
 
 
 async def get_any_tickets_count_for_user(user_id: int):
-    async with lock:
-        tickets = await load_tickets()
-        owner_to_check = user_id
-        any_count = sum(
-            1
-            for ticket in tickets.values()
-            if ticket["owner_id"] == owner_to_check
-        )
-        return any_count
+    """Every ticket the user ever opened, archived ones included."""
+    await load_tickets()
+    return _index.count_for_owner(user_id) + archive.count_for_owner(user_id)
+
+
+async def get_total_tickets_count():
+    """Every ticket ever created, archived ones included."""
+    return len(await load_tickets()) + archive.count()
+
+
+async def get_ticket_ids_by_status(*statuses: str) -> set:
+    await load_tickets()
+    return set().union(
+        *(_index.statuses.get(status, ()) for status in statuses)
+    )
+
+
+async def get_claimed_ticket_ids(claimer_id: int) -> set:
+    """Open and inactive tickets currently claimed by a staff member."""
+    await load_tickets()
+    return set(_index.claimers.get(claimer_id, ()))
+
+
+def _closed_time(ticket: Ticket) -> float:
+    # Tickets closed before closed_at was recorded fall back to creation.
+    return ticket.closed_at or ticket.created_at
+
+
+async def archive_closed_tickets(max_age_days: int) -> int:
+    """
+    Move tickets closed more than max_age_days ago out of the store and
+    into the archive, so the store only grows with the open tickets.
+    """
+    tickets = await load_tickets()
+    cutoff = utcnow().timestamp() - max_age_days * 86400
+    batch = [
+        key
+        for key in _index.statuses.get(TicketStatus.CLOSED, ())
+        if _closed_time(tickets[key]) < cutoff
+    ]
+    if not batch:
+        return 0
+    fresh = [
+        tickets[key].to_dict() for key in batch
+        if not archive.already_archived(key)
+    ]
+    if fresh:
+        await _run_io(archive.append, fresh)
+
+    committed = None
+    async with locks.store():
+        for key in batch:
+            ticket = tickets.get(key)
+            if ticket and ticket.status == TicketStatus.CLOSED:
+                del tickets[key]
+                _index.update(key, None)
+                committed = _mark_dirty(key)
+    if committed:
+        await _wait_committed(committed)
+    return len(batch)
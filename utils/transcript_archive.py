@@ -0,0 +1,194 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+import gzip
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+botlogger = logging.getLogger("bot")
+archive_dir = Path("data/transcript_archive")
+token_pattern = re.compile(r"\w{2,40}")
+# BM25 parameters.
+k1 = 1.2
+b = 0.75
+
+
+def tokenize(text: str) -> list:
+    return token_pattern.findall(text.lower())
+
+
+def record_text(record: dict) -> str:
+    """The searchable text of one message record."""
+    parts = [record["author"], record["content"]]
+    if isinstance(record["embeds"], list):
+        for embed in record["embeds"]:
+            parts.append(embed.get("title", ""))
+            parts.append(embed.get("description", ""))
+            for field in embed.get("fields", ()):
+                parts.append(field.get("name", ""))
+                parts.append(field.get("value", ""))
+    for url in record["attachments"]:
+        parts.append(url.split("?", 1)[0].rsplit("/", 1)[-1])
+    return " ".join(parts)
+
+
+class TranscriptArchive:
+    """
+    Every closed ticket's message records, kept as one gzip JSONL file
+    per ticket, with an inverted index over their text.
+
+    index.jsonl is append-only, one line per archived ticket with its
+    facets (owner, claimer, close time) and term counts. Archiving a
+    ticket appends its line and updates the in-memory postings, so the
+    index is never rebuilt. Loading replays the file. Methods do
+    blocking I/O and are meant to run off the event loop.
+    """
+
+    def __init__(self, directory: Path = archive_dir):
+        self.directory = directory
+        self.index_path = directory / "index.jsonl"
+        self.loaded = False
+        self.documents: dict[int, dict] = {}
+        self.postings: dict[str, dict] = {}
+        self.total_length = 0
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        self.loaded = True
+        if not self.index_path.exists():
+            return
+        good_size = 0
+        with open(self.index_path, "rb") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    if line.endswith(b"\n"):
+                        botlogger.warning(
+                            f"Skipped an unreadable entry in {self.index_path}."
+                        )
+                        good_size += len(line)
+                        continue
+                    botlogger.warning(
+                        f"Dropped a torn entry at the end of {self.index_path}."
+                    )
+                    break
+                good_size += len(line)
+                self.add_to_index(entry)
+        if good_size != self.index_path.stat().st_size:
+            with open(self.index_path, "r+b") as file:
+                file.truncate(good_size)
+
+    def add_to_index(self, entry: dict) -> None:
+        channel_id = entry["channel_id"]
+        if channel_id in self.documents:
+            self.remove_from_index(channel_id)
+        terms = entry.pop("terms")
+        self.documents[channel_id] = entry
+        self.total_length += entry["length"]
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[channel_id] = count
+
+    def remove_from_index(self, channel_id: int) -> None:
+        entry = self.documents.pop(channel_id)
+        self.total_length -= entry["length"]
+        # Only happens when a ticket is archived twice, a scan is fine.
+        for term in [t for t, ids in self.postings.items() if channel_id in ids]:
+            del self.postings[term][channel_id]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def transcript_path(self, channel_id: int) -> Path:
+        return self.directory / f"{channel_id}.jsonl.gz"
+
+    def add(self, records_path: Path, meta: dict) -> None:
+        """
+        Archive the records of a closed ticket and index them. meta holds
+        channel_id, name, owner_id, claimer_id and closed_at.
+        """
+        self.load()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        terms = Counter()
+        messages = 0
+        temp_path = self.transcript_path(meta["channel_id"]).with_suffix(".tmp")
+        with open(records_path, "rb") as source, gzip.open(temp_path, "wb") as target:
+            for line in source:
+                target.write(line)
+                terms.update(tokenize(record_text(json.loads(line))))
+                messages += 1
+        os.replace(temp_path, self.transcript_path(meta["channel_id"]))
+        entry = dict(
+            meta,
+            messages=messages,
+            length=sum(terms.values()),
+            terms=dict(terms),
+        )
+        with open(self.index_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.add_to_index(entry)
+
+    def copy_records(self, channel_id: int, target: Path) -> bool:
+        """Unpack the records of an archived ticket, False if there are none."""
+        self.load()
+        path = self.transcript_path(channel_id)
+        if not path.exists():
+            return False
+        with gzip.open(path, "rb") as source, open(target, "wb") as output:
+            shutil.copyfileobj(source, output)
+        return True
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        owner_id: Optional[int] = None,
+        claimer_id: Optional[int] = None,
+        closed_after: Optional[float] = None,
+    ) -> list:
+        """
+        The best matches for query ranked by BM25, as (score, entry)
+        pairs. Tickets can be filtered by owner, claimer and close time.
+        """
+        self.load()
+        terms = set(tokenize(query))
+        if not terms or not self.documents:
+            return []
+        average_length = self.total_length / len(self.documents) or 1
+        scores = Counter()
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(
+                1 + (len(self.documents) - len(postings) + 0.5)
+                / (len(postings) + 0.5)
+            )
+            for channel_id, count in postings.items():
+                entry = self.documents[channel_id]
+                if owner_id is not None and entry["owner_id"] != owner_id:
+                    continue
+                if claimer_id is not None and entry["claimer_id"] != claimer_id:
+                    continue
+                if closed_after is not None and (entry["closed_at"] or 0) < closed_after:
+                    continue
+                norm = 1 - b + b * entry["length"] / average_length
+                scores[channel_id] += idf * count * (k1 + 1) / (count + k1 * norm)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(score, self.documents[channel_id]) for channel_id, score in best]
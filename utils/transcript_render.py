@@ -0,0 +1,246 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+# Runs in the transcript process pool, keep it to the standard library.
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from html import escape
+from pathlib import Path
+import gzip
+import json
+import zipfile
+
+# Room kept under the upload limit for data still buffered by the
+# compressor and for the end of the file.
+reserve = 256 * 1024
+image_suffixes = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+# Replies quote a message seen this recently in the transcript.
+quoted_messages = 1000
+
+style = """
+body{background:#313338;color:#dbdee1;font-family:sans-serif;margin:0 2em}
+header{border-bottom:1px solid #4e5058;padding:1em 0}
+.msg{padding:.4em 0;border-bottom:1px solid #3f4147}
+.author{font-weight:bold;color:#f2f3f5}
+.time,.edited,.id{color:#949ba4;font-size:.8em}
+.content{white-space:pre-wrap;word-wrap:break-word}
+.reply{color:#949ba4;font-size:.85em;border-left:2px solid #4e5058;padding-left:.5em}
+.embed{border-left:4px solid #1e1f22;background:#2b2d31;margin:.3em 0;padding:.5em;max-width:40em}
+.embed .title{font-weight:bold}
+.embed .field-name{font-weight:bold;margin-top:.3em}
+.embed .footer{color:#949ba4;font-size:.8em;margin-top:.3em}
+img{max-width:25em;max-height:25em;display:block;margin:.3em 0}
+a{color:#00a8fc}
+"""
+
+
+def message_time(record: dict) -> str:
+    return datetime.fromtimestamp(record["at"], timezone.utc).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+
+
+def format_text(record: dict) -> str:
+    msg_content = record["content"]
+    if not msg_content and record["embeds"]:
+        msg_content = "[ EMBED CONTENT ]"
+    line = f"[{message_time(record)}] {record['author']} ({record['author_id']}): {msg_content}\n"
+    for url in record["attachments"]:
+        line += f"    [ATTACHMENT: {url}]\n"
+    return line
+
+
+def text_header(meta: dict) -> str:
+    return (
+        f"Transcript for {meta['name']} ({meta['id']}) !\n"
+        f"Exported on {meta['exported']}\n{'*'*50}\n\n"
+    )
+
+
+def html_header(meta: dict) -> str:
+    name = escape(meta["name"])
+    return (
+        f"<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>Transcript for {name}</title><style>{style}</style>"
+        f"</head><body><header><h2>Transcript for {name}</h2>"
+        f"<div class=\"id\">Ticket {meta['id']}, exported on "
+        f"{escape(meta['exported'])}</div></header>\n"
+    )
+
+
+html_footer = "</body></html>\n"
+
+
+def format_embed(embed: dict) -> str:
+    parts = []
+    color = embed.get("color")
+    border = f" style=\"border-color:#{color:06x}\"" if color else ""
+    if embed.get("author", {}).get("name"):
+        parts.append(f"<div class=\"author\">{escape(embed['author']['name'])}</div>")
+    if embed.get("title"):
+        title = escape(embed["title"])
+        if embed.get("url"):
+            title = f"<a href=\"{escape(embed['url'])}\">{title}</a>"
+        parts.append(f"<div class=\"title\">{title}</div>")
+    if embed.get("description"):
+        parts.append(f"<div class=\"content\">{escape(embed['description'])}</div>")
+    for field in embed.get("fields", ()):
+        parts.append(
+            f"<div class=\"field-name\">{escape(field.get('name', ''))}</div>"
+            f"<div class=\"content\">{escape(field.get('value', ''))}</div>"
+        )
+    for key in ("image", "thumbnail"):
+        if embed.get(key, {}).get("url"):
+            parts.append(f"<img src=\"{escape(embed[key]['url'])}\" alt=\"\">")
+    if embed.get("footer", {}).get("text"):
+        parts.append(f"<div class=\"footer\">{escape(embed['footer']['text'])}</div>")
+    return f"<div class=\"embed\"{border}>{''.join(parts)}</div>"
+
+
+def format_attachment(url: str) -> str:
+    url = escape(url)
+    if url.split("?", 1)[0].lower().endswith(image_suffixes):
+        return f"<a href=\"{url}\"><img src=\"{url}\" alt=\"\"></a>"
+    return f"<div><a href=\"{url}\">{url.split('?', 1)[0].rsplit('/', 1)[-1]}</a></div>"
+
+
+def format_html(record: dict, quotes: OrderedDict) -> str:
+    parts = [f"<div class=\"msg\" id=\"m{record['id']}\">"]
+    reply_to = record.get("reply_to")
+    if reply_to:
+        quote = quotes.get(reply_to)
+        text = (
+            f"{escape(quote[0])}: {escape(quote[1])}"
+            if quote
+            else "an earlier message"
+        )
+        parts.append(
+            f"<div class=\"reply\"><a href=\"#m{reply_to}\">Replying to</a> {text}</div>"
+        )
+    parts.append(
+        f"<span class=\"author\">{escape(record['author'])}</span> "
+        f"<span class=\"id\">({record['author_id']})</span> "
+        f"<span class=\"time\">{message_time(record)}</span>"
+    )
+    if record.get("edited"):
+        parts.append(" <span class=\"edited\">(edited)</span>")
+    if record["content"]:
+        parts.append(f"<div class=\"content\">{escape(record['content'])}</div>")
+    if isinstance(record["embeds"], list):
+        parts.extend(format_embed(embed) for embed in record["embeds"])
+    elif record["embeds"]:
+        # Logged before embeds were recorded.
+        parts.append("<div class=\"embed\">[ EMBED CONTENT ]</div>")
+    parts.extend(format_attachment(url) for url in record["attachments"])
+    parts.append("</div>\n")
+
+    quotes[record["id"]] = (record["author"], record["content"][:100])
+    if len(quotes) > quoted_messages:
+        quotes.popitem(last=False)
+    return "".join(parts)
+
+
+class PartWriter:
+    """
+    Writes a transcript as numbered files that each stay under limit
+    bytes once compressed. A new part starts only between messages.
+    """
+
+    def __init__(self, directory: Path, stem: str, suffix: str, compression: str, limit: int):
+        self.directory = directory
+        self.stem = stem
+        self.suffix = suffix
+        self.compression = compression
+        self.limit = limit
+        self.paths = []
+        self.raw = None
+        self.file = None
+        self.archive = None
+        self.messages = 0
+
+    def open(self) -> None:
+        number = len(self.paths) + 1
+        name = self.stem if number == 1 else f"{self.stem}-part{number}"
+        name += self.suffix
+        if self.compression == "gzip":
+            path = self.directory / f"{name}.gz"
+        elif self.compression == "zip":
+            path = self.directory / f"{name}.zip"
+        else:
+            path = self.directory / name
+        self.paths.append(path)
+        self.raw = open(path, "wb")
+        self.messages = 0
+        if self.compression == "gzip":
+            self.file = gzip.GzipFile(filename=name, mode="wb", fileobj=self.raw)
+        elif self.compression == "zip":
+            self.archive = zipfile.ZipFile(self.raw, "w", zipfile.ZIP_DEFLATED)
+            self.file = self.archive.open(name, "w")
+        else:
+            self.file = self.raw
+
+    def close(self) -> None:
+        if self.file is not self.raw:
+            self.file.close()
+        if self.archive:
+            self.archive.close()
+            self.archive = None
+        self.raw.close()
+
+    def fits(self, size: int) -> bool:
+        if not self.messages:
+            return True
+        slack = 0 if self.compression == "none" else reserve
+        return self.raw.tell() + size + slack <= self.limit
+
+
+def render(
+    records_path: str,
+    directory: str,
+    meta: dict,
+    transcript_format: str,
+    compression: str,
+    limit: int,
+) -> list:
+    """
+    Render the JSONL message records at records_path into transcript
+    files in directory, returns their paths in order. Each part is a
+    complete document, so any of them opens on its own.
+    """
+    if transcript_format == "html":
+        header, footer, suffix = html_header(meta), html_footer, ".html"
+    else:
+        header, footer, suffix = text_header(meta), "", ".txt"
+    header = header.encode("utf-8")
+    footer = footer.encode("utf-8")
+    quotes = OrderedDict()
+    writer = PartWriter(
+        Path(directory), f"transcript-{meta['name']}", suffix, compression, limit
+    )
+    writer.open()
+    writer.file.write(header)
+    with open(records_path, "r", encoding="utf-8") as records:
+        for line in records:
+            record = json.loads(line)
+            if transcript_format == "html":
+                chunk = format_html(record, quotes)
+            else:
+                chunk = format_text(record)
+            chunk = chunk.encode("utf-8")
+            if not writer.fits(len(chunk) + len(footer)):
+                writer.file.write(footer)
+                writer.close()
+                writer.open()
+                writer.file.write(header)
+            writer.file.write(chunk)
+            writer.messages += 1
+    writer.file.write(footer)
+    writer.close()
+    return [str(path) for path in writer.paths]
@@ -0,0 +1,363 @@
+# RaelBot - Discord bot for ticket systems
+# Copyright (C) 2026 iAm-xRa
+#
+# This file is part of RaelBot, a free software project.
+# RaelBot is licensed under the GNU General Public License v3.
+# You should have received a copy of the GPL along with this file.
+# If not, see https://www.gnu.org/licenses/gpl-3.0.txt
+
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+from typing import Optional
+from utils import timestmp, transcript_render
+from utils.transcript_archive import TranscriptArchive
+from utils.config import load_config
+import asyncio
+import discord
+import json
+import logging
+import multiprocessing
+import shutil
+import tempfile
+
+botlogger = logging.getLogger("bot")
+botconfig = load_config()
+log_dir = Path("data/transcripts")
+# Records are encoded and written this many messages at a time.
+chunk_messages = 500
+# Logged messages are batched and appended at most this often.
+flush_delay = 1.0
+
+_pending: dict[int, list] = {}
+_flush_task: Optional[asyncio.Task] = None
+_closed = False
+_io_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="transcripts-io"
+)
+# Rendering is CPU bound, it runs in other processes. Created on first use.
+_render_pool: Optional[ProcessPoolExecutor] = None
+# Only touched from the transcripts I/O thread.
+archive = TranscriptArchive()
+
+
+class Transcript:
+    """The message records of a ticket and the files rendered from them."""
+
+    __slots__ = ("records", "parts")
+
+    def __init__(self, records: Path, parts: list):
+        self.records = records
+        self.parts = parts
+
+
+async def _run_io(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, partial(func, *args))
+
+
+def log_path(channel_id: int) -> Path:
+    return log_dir / f"{channel_id}.jsonl"
+
+
+def record_message(msg: discord.Message) -> dict:
+    return {
+        "op": "message",
+        "id": msg.id,
+        "at": msg.created_at.timestamp(),
+        "author": msg.author.name,
+        "author_id": msg.author.id,
+        "content": msg.content,
+        "embeds": [embed.to_dict() for embed in msg.embeds],
+        "attachments": [attachment.url for attachment in msg.attachments],
+        "reply_to": msg.reference.message_id if msg.reference else None,
+        "edited": msg.edited_at is not None,
+    }
+
+
+def log(channel_id: int, record: dict) -> None:
+    """
+    Queue a record for the log of a ticket. Records are appended in
+    batches on the transcripts I/O thread, call flush() to wait for them.
+    """
+    global _flush_task
+    if _closed:
+        botlogger.warning(
+            f"Dropped a transcript record for {channel_id}, logs are closed."
+        )
+        return
+    _pending.setdefault(channel_id, []).append(record)
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_later())
+
+
+def start(channel_id: int) -> None:
+    """
+    Mark the log of a new ticket as complete from its first message,
+    logs of older tickets are ignored in favour of the channel history.
+    """
+    log(channel_id, {"op": "start"})
+
+
+def log_message(msg: discord.Message) -> None:
+    log(msg.channel.id, record_message(msg))
+
+
+def log_edit(channel_id: int, message_id: int, data: dict) -> None:
+    """Log an edit from a raw MESSAGE_UPDATE payload."""
+    record = {"op": "edit", "id": message_id}
+    if "content" in data:
+        record["content"] = data["content"]
+    if "attachments" in data:
+        record["attachments"] = [
+            attachment["url"] for attachment in data["attachments"]
+        ]
+    if "embeds" in data:
+        record["embeds"] = data["embeds"]
+    if len(record) > 2:
+        # Embeds being unfurled also send an update, without a timestamp.
+        if data.get("edited_timestamp"):
+            record["edited"] = True
+        log(channel_id, record)
+
+
+async def _flush_later() -> None:
+    await asyncio.sleep(flush_delay)
+    await flush()
+
+
+def _append(batch: dict) -> None:
+    log_dir.mkdir(parents=True, exist_ok=True)
+    for channel_id, records in batch.items():
+        with open(log_path(channel_id), "a", encoding="utf-8") as file:
+            file.writelines(
+                json.dumps(record, separators=(",", ":")) + "\n"
+                for record in records
+            )
+
+
+async def flush() -> None:
+    """Append every queued record to its log."""
+    if not _pending:
+        return
+    batch = dict(_pending)
+    _pending.clear()
+    try:
+        await _run_io(_append, batch)
+    except OSError as e:
+        botlogger.error(f"Failed to write transcript logs.\n{e}")
+
+
+async def close() -> None:
+    global _closed
+    if _closed:
+        return
+    await flush()
+    _closed = True
+    _io_executor.shutdown(wait=True)
+    if _render_pool:
+        _render_pool.shutdown(wait=True)
+
+
+def _read_log(channel_id: int):
+    path = log_path(channel_id)
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                botlogger.warning(f"Skipped an unreadable record in {path}.")
+
+
+def _last_logged_id(channel_id: int) -> Optional[int]:
+    last_id = None
+    for record in _read_log(channel_id):
+        if record["op"] == "message":
+            last_id = max(last_id or 0, record["id"])
+    return last_id
+
+
+def _last_logged_ids(channel_ids) -> dict:
+    return {
+        channel_id: last_id
+        for channel_id in channel_ids
+        if (last_id := _last_logged_id(channel_id))
+    }
+
+
+async def last_logged_ids(channel_ids) -> dict:
+    """The newest logged message of each ticket that has a log."""
+    await flush()
+    return await _run_io(_last_logged_ids, list(channel_ids))
+
+
+def _logged_messages(channel_id: int, ordered: bool):
+    if ordered:
+        for record in _read_log(channel_id):
+            if record["op"] == "message":
+                yield record
+        return
+    # Messages caught up after a restart land behind newer live ones and
+    # may repeat them, sorting by id restores the channel order.
+    messages = {}
+    for record in _read_log(channel_id):
+        if record["op"] == "message":
+            messages.setdefault(record["id"], record)
+    for message_id in sorted(messages):
+        yield messages[message_id]
+
+
+def _write_logged(channel_id: int, output) -> Optional[int]:
+    # Edits and the order are checked first, so the log is only held in
+    # memory when it's out of order.
+    started = False
+    ordered = True
+    last_id = 0
+    edits = {}
+    for record in _read_log(channel_id):
+        if record["op"] == "start":
+            started = True
+        elif record["op"] == "edit":
+            del record["op"]
+            edits.setdefault(record["id"], {}).update(record)
+        elif record["op"] == "message":
+            ordered = ordered and record["id"] > last_id
+            last_id = max(last_id, record["id"])
+    if not started:
+        return None
+    chunk = []
+    for record in _logged_messages(channel_id, ordered):
+        if record["id"] in edits:
+            record.update(edits[record["id"]])
+        chunk.append(json.dumps(record, separators=(",", ":")) + "\n")
+        if len(chunk) >= chunk_messages:
+            output.write("".join(chunk))
+            chunk.clear()
+    if chunk:
+        output.write("".join(chunk))
+    return last_id or None
+
+
+async def discard(channel_id: int) -> None:
+    """Drop the log of a ticket, once its channel is gone."""
+    _pending.pop(channel_id, None)
+    await _run_io(partial(log_path(channel_id).unlink, missing_ok=True))
+
+
+async def _collect(channel: discord.TextChannel, records_path: Path) -> None:
+    # The log first, then whatever the history has after it.
+    await flush()
+    with open(records_path, "w", encoding="utf-8") as output:
+        last_id = await _run_io(_write_logged, channel.id, output)
+        after = discord.Object(id=last_id) if last_id else None
+        chunk = []
+        async for msg in channel.history(
+            limit=None, after=after, oldest_first=True
+        ):
+            chunk.append(
+                json.dumps(record_message(msg), separators=(",", ":")) + "\n"
+            )
+            if len(chunk) >= chunk_messages:
+                output.write("".join(chunk))
+                chunk.clear()
+        if chunk:
+            output.write("".join(chunk))
+
+
+async def _render(*args) -> list:
+    global _render_pool
+    if _render_pool is None:
+        # Forking a process that runs I/O threads can copy a held lock
+        # into the child, transcript_render only needs a fresh interpreter.
+        _render_pool = ProcessPoolExecutor(
+            max_workers=botconfig.transcript_render_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _render_pool, partial(transcript_render.render, *args)
+    )
+
+
+async def _render_records(
+    records_path: Path, name: str, channel_id: int
+) -> list:
+    meta = {
+        "name": name,
+        "id": channel_id,
+        "exported": str(timestmp.utcnow()),
+    }
+    parts = await _render(
+        str(records_path),
+        str(records_path.parent),
+        meta,
+        botconfig.transcript_format,
+        botconfig.transcript_compression,
+        botconfig.transcript_upload_limit,
+    )
+    return [Path(part) for part in parts]
+
+
+@asynccontextmanager
+async def render_transcript(channel: discord.TextChannel):
+    """
+    Build the transcript of a ticket, yields a Transcript.
+
+    Messages come from the ticket's local log, only those after the last
+    logged one are read from the channel history. A ticket created
+    before logging started has its whole history read. The records go
+    through a temporary file and are rendered in the process pool in the
+    configured format and compression, split into parts that each fit
+    the upload limit. The files are removed when the block exits.
+    """
+    directory = Path(tempfile.mkdtemp(prefix="transcript-"))
+    try:
+        records_path = directory / "records.jsonl"
+        await _collect(channel, records_path)
+        parts = await _render_records(records_path, channel.name, channel.id)
+        yield Transcript(records_path, parts)
+    finally:
+        await _run_io(partial(shutil.rmtree, directory, ignore_errors=True))
+
+
+def _copy_archived(channel_id: int, target: Path) -> Optional[dict]:
+    # The records and the index entry, read together on the I/O thread.
+    if not archive.copy_records(channel_id, target):
+        return None
+    return archive.documents.get(channel_id, {})
+
+
+@asynccontextmanager
+async def render_archived(channel_id: int):
+    """Like render_transcript for an archived ticket, yields None if unknown."""
+    directory = Path(tempfile.mkdtemp(prefix="transcript-"))
+    try:
+        records_path = directory / "records.jsonl"
+        entry = await _run_io(_copy_archived, channel_id, records_path)
+        if entry is None:
+            yield None
+            return
+        parts = await _render_records(
+            records_path, entry.get("name", str(channel_id)), channel_id
+        )
+        yield Transcript(records_path, parts)
+    finally:
+        await _run_io(partial(shutil.rmtree, directory, ignore_errors=True))
+
+
+async def archive_transcript(transcript: Transcript, meta: dict) -> None:
+    """Keep the records of a closed ticket in the local archive and index them."""
+    await _run_io(archive.add, transcript.records, meta)
+
+
+async def load_archive() -> None:
+    await _run_io(archive.load)
+
+
+async def search_archive(query: str, **filters) -> list:
+    """Ranked (score, entry) matches from the transcript archive."""
+    return await _run_io(partial(archive.search, query, **filters))